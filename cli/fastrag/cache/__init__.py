@@ -2,5 +2,7 @@ from fastrag.cache.cache import ICache
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
 from fastrag.cache.local import LocalCache
+from fastrag.cache.s3 import S3Cache
+from fastrag.cache.sqlite import SqliteCache
 
-__all__ = [ICache, LocalCache, CacheEntry, Filter, MetadataFilter]
+__all__ = [ICache, LocalCache, SqliteCache, S3Cache, CacheEntry, Filter, MetadataFilter]
@@ -1,17 +1,43 @@
+import inspect
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Awaitable, Callable, Iterable
+from typing import AsyncIterable, Awaitable, Callable, Iterable
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter
 from fastrag.plugins import PluginBase
 
 ContentsCallable = Callable[[], bytes | Awaitable[bytes]]
+CreateItem = tuple[str, bytes, dict | None]
+GetOrCreateItem = tuple[str, ContentsCallable, dict | None]
+
+# Metadata keys that allow renewing an outdated entry without regenerating its contents:
+# HTTP validators for conditional requests, sitemap modification dates and the lineage of
+# derived entries
+VALIDATORS = ("etag", "last_modified", "lastmod", "lineage")
+
+
+async def resolve(contents: ContentsCallable) -> bytes:
+    """Call the contents callable, awaiting it if needed
+
+    Args:
+        contents (ContentsCallable): callable or awaitable callable that gives content.
+
+    Returns:
+        bytes: contents
+    """
+
+    result = contents()
+    if inspect.isawaitable(result):
+        return await result
+    return result
 
 
 @dataclass
 class ICache(PluginBase, ABC):
     lifespan: int
+    max_size: int | None = None  # bytes, implementations evict entries past it
+    eviction: str = "lru"
 
     @abstractmethod
     def is_present(self, uri: str) -> bool:
@@ -79,6 +105,97 @@ class ICache(PluginBase, ABC):
 
         raise NotImplementedError
 
+    @abstractmethod
+    async def peek(self, uri: str) -> CacheEntry | None:
+        """Gets a cache entry from the given URI even if its lifespan is over, so it can be
+        revalidated and renewed. Outdated entries are kept for another lifespan when their
+        metadata allows it (see `VALIDATORS`).
+
+        Args:
+            uri (str): URI of the entry
+
+        Returns:
+            CacheEntry | None: Cache entry, outdated or not
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    async def renew(self, uri: str, metadata: dict | None = None) -> CacheEntry | None:
+        """Restarts the lifespan of an entry whose contents are known to be unchanged,
+        without rewriting them
+
+        Args:
+            uri (str): URI of the entry
+            metadata (dict | None, optional): metadata to merge into the stored one.
+            Defaults to None.
+
+        Returns:
+            CacheEntry | None: renewed entry, None if there is no entry for the URI
+        """
+
+        raise NotImplementedError
+
+    async def get_many(self, uris: Iterable[str]) -> list[CacheEntry | None]:
+        """Gets the cache entries of the given URIs, in the same order
+
+        Args:
+            uris (Iterable[str]): URIs of the entries
+
+        Returns:
+            list[CacheEntry | None]: Cache entries, None for missing ones
+        """
+
+        return [await self.get(uri) for uri in uris]
+
+    async def create_stream(
+        self,
+        uri: str,
+        chunks: AsyncIterable[bytes],
+        metadata: dict | None = None,
+    ) -> CacheEntry:
+        """Creates a new entry from contents that arrive in chunks. Implementations should
+        override it to write the chunks as they arrive, instead of joining them in memory.
+        Nothing is stored if the chunks fail.
+
+        Args:
+            uri (str): resource URI
+            chunks (AsyncIterable[bytes]): contents to store
+            metadata (dict | None, optional): additional metadata. Defaults to None.
+
+        Returns:
+            CacheEntry: created entry
+        """
+
+        return await self.create(uri, b"".join([chunk async for chunk in chunks]), metadata)
+
+    async def create_many(self, items: Iterable[CreateItem]) -> list[CacheEntry]:
+        """Creates several entries at once. Implementations should override it to write
+        the batch with a single critical section.
+
+        Args:
+            items (Iterable[CreateItem]): (uri, contents, metadata) triples
+
+        Returns:
+            list[CacheEntry]: created entries, in the same order
+        """
+
+        return [await self.create(uri, contents, metadata) for uri, contents, metadata in items]
+
+    async def get_or_create_many(
+        self, items: Iterable[GetOrCreateItem]
+    ) -> list[tuple[bool, CacheEntry]]:
+        """Batched `get_or_create`, the missing contents are generated concurrently.
+
+        Args:
+            items (Iterable[GetOrCreateItem]): (uri, contents callable, metadata) triples
+
+        Returns:
+            list[tuple[bool, CacheEntry]]: if each one already existed, the entry
+        """
+
+        return [await self.get_or_create(*item) for item in items]
+
     @abstractmethod
     async def get_entries(
         self, filter: Filter | None = None
@@ -96,11 +213,15 @@ class ICache(PluginBase, ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def clean(self) -> int:
-        """Cleans the cache
+    async def clean(self, filter: Filter | None = None) -> int:
+        """Cleans the cache, or only the entries that pass the given filter
+
+        Args:
+            filter (Filter | None, optional): Filter of the entries to delete, the whole
+            cache is deleted if not given. Defaults to None.
 
         Returns:
-            int: cleaned size
+            int: freed bytes, according to the stored entry sizes
         """
 
         raise NotImplementedError
@@ -0,0 +1,131 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import ClassVar, Protocol, override
+
+
+class Decompressor(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class ICodec(ABC):
+    """Compression codec used for the cached blobs"""
+
+    name: ClassVar[str]
+
+    @abstractmethod
+    def compress(self, data: bytes, level: int | None = None) -> bytes:
+        """Compress the given data
+
+        Args:
+            data (bytes): data to compress
+            level (int | None, optional): codec specific level. Defaults to None.
+
+        Returns:
+            bytes: compressed data
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def decompressor(self) -> Decompressor:
+        """Incremental decompressor, fed with consecutive chunks of compressed data
+
+        Returns:
+            Decompressor: decompressor object
+        """
+
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressor().decompress(data)
+
+    def check(self, level: int | None = None) -> None:
+        """Make sure the codec can be used with the given level, so a misconfigured cache
+        fails when created rather than on its first write
+
+        Args:
+            level (int | None, optional): codec specific level. Defaults to None.
+
+        Raises:
+            ImportError: the codec library is not installed
+            ValueError: invalid level
+        """
+
+        try:
+            self.compress(b"", level)
+        except ImportError as e:
+            raise ImportError(f"The {self.name} codec requires fastrag-cli[{self.name}]") from e
+        except Exception as e:
+            raise ValueError(f"Invalid {self.name} compression level: {level}") from e
+
+
+@dataclass(frozen=True)
+class ZlibCodec(ICodec):
+    name: ClassVar[str] = "zlib"
+
+    @override
+    def compress(self, data: bytes, level: int | None = None) -> bytes:
+        import zlib
+
+        return zlib.compress(data, -1 if level is None else level)
+
+    @override
+    def decompressor(self) -> Decompressor:
+        import zlib
+
+        return zlib.decompressobj()
+
+
+@dataclass(frozen=True)
+class ZstdCodec(ICodec):
+    name: ClassVar[str] = "zstd"
+
+    @override
+    def compress(self, data: bytes, level: int | None = None) -> bytes:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+    @override
+    def decompressor(self) -> Decompressor:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj()
+
+
+@dataclass(frozen=True)
+class Lz4Codec(ICodec):
+    name: ClassVar[str] = "lz4"
+
+    @override
+    def compress(self, data: bytes, level: int | None = None) -> bytes:
+        import lz4.frame
+
+        return lz4.frame.compress(data, compression_level=level or 0)
+
+    @override
+    def decompressor(self) -> Decompressor:
+        import lz4.frame
+
+        return lz4.frame.LZ4FrameDecompressor()
+
+
+CODECS: dict[str, ICodec] = {c.name: c() for c in (ZlibCodec, ZstdCodec, Lz4Codec)}
+
+
+def get_codec(name: str) -> ICodec:
+    """Get the codec registered with the given name
+
+    Args:
+        name (str): codec name
+
+    Raises:
+        ValueError: unknown codec
+
+    Returns:
+        ICodec: codec
+    """
+
+    if name not in CODECS:
+        raise ValueError(f"Unsupported compression codec: {name!r}")
+    return CODECS[name]
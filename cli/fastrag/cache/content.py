@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable
+
+
+@dataclass
+class ContentCache:
+    """In-process LRU of decoded blob contents bounded by bytes, shared by all entries.
+    Blobs larger than the whole budget are never kept."""
+
+    max_size: int
+
+    _size: int = field(init=False, repr=False, default=0)
+    _items: OrderedDict[Hashable, bytes] = field(
+        init=False, repr=False, default_factory=OrderedDict
+    )
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+            return content
+
+    def put(self, key: Hashable, content: bytes) -> None:
+        if len(content) > self.max_size:
+            return
+
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._items[key] = content
+            self._size += len(content)
+            self._shrink()
+
+    def resize(self, max_size: int) -> None:
+        with self._lock:
+            self.max_size = max_size
+            self._shrink()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def _shrink(self) -> None:
+        while self._size > self.max_size:
+            _, content = self._items.popitem(last=False)
+            self._size -= len(content)
+
+
+content_cache = ContentCache(max_size=256 * 1024**2)
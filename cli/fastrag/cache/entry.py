@@ -1,9 +1,18 @@
+import asyncio
+import mmap
+import os
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field, fields
+from io import BytesIO
 from pathlib import Path
-from urllib.parse import unquote, urlparse
+from typing import AsyncIterator
+from urllib.parse import unquote
 
 import aiofiles
 
+from fastrag.cache.compression import get_codec
+from fastrag.cache.content import content_cache
+from fastrag.cache.stats import cache_stats
 from fastrag.cache.utils import PosixTimestamp, timestamp
 
 
@@ -12,8 +21,9 @@ class CacheEntry:
     path: Path
     timestamp: PosixTimestamp = field(default_factory=timestamp)
     metadata: dict | None = field(default=None)
-
-    _content: bytes | None = field(default=None, init=False, repr=False, compare=False)
+    size: int | None = field(default=None)
+    codec: str | None = field(default=None)
+    digest: str | None = field(default=None)  # sha256 of the decoded contents
 
     def to_dict(self) -> dict:
         return {
@@ -23,16 +33,95 @@ class CacheEntry:
     @staticmethod
     def from_dict(d: dict) -> "CacheEntry":
         d = dict(d)
-        parsed = urlparse(d["path"])
-        d["path"] = Path(unquote(parsed.path))
+        # Paths are always stored as `file://` URIs, urlparse is needlessly slow for them.
+        # Resolved, as entries written by previous versions may go through symlinks.
+        d["path"] = Path(unquote(d["path"].removeprefix("file://"))).resolve()
         return CacheEntry(**d)
 
     @property
     def content(self) -> bytes:
-        return self.path.read_bytes()
+        return self._decode(self._read())
 
     async def get_content(self) -> bytes:
-        if self._content is None:
-            async with aiofiles.open(self.path, "rb") as f:
-                object.__setattr__(self, "_content", await f.read())
-        return self._content
+        # Keyed by timestamp too, since rewriting an URI reuses its blob path
+        key = (self.path, self.timestamp)
+        content = content_cache.get(key)
+        if content is None:
+            if self.codec:
+                # Decoded as it is read, the whole compressed blob is never held too
+                buffer = BytesIO()
+                async for chunk in self.iter_content():
+                    buffer.write(chunk)
+                content = buffer.getvalue()
+            else:
+                async with aiofiles.open(self.path, "rb") as f:
+                    content = await f.read()
+                cache_stats.read(self.metadata, len(content))
+            content_cache.put(key, content)
+        return content
+
+    @asynccontextmanager
+    async def view(self) -> AsyncIterator[memoryview]:
+        """Read-only view of the decoded contents. Uncompressed blobs are memory-mapped, so
+        they are parsed in place without being copied into memory, and concurrent readers
+        share the OS page cache. The view (and any slice of it) must not be used after the
+        context exits.
+
+        Yields:
+            memoryview: contents view
+        """
+
+        content = content_cache.get((self.path, self.timestamp))
+        if content is None and self.codec:
+            # Compressed blobs are decoded anyway, through the content cache
+            content = await self.get_content()
+        if content is not None:
+            yield memoryview(content)
+            return
+
+        loop = asyncio.get_running_loop()
+        mapped = await loop.run_in_executor(None, self._map)
+        if mapped is None:
+            yield memoryview(b"")
+            return
+
+        cache_stats.read(self.metadata, len(mapped))
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
+
+    async def iter_content(self, chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+        """Stream the decoded contents, without holding the whole blob in memory
+
+        Args:
+            chunk_size (int, optional): bytes read per iteration. Defaults to 1 MiB.
+
+        Yields:
+            bytes: decoded chunk
+        """
+
+        decompressor = get_codec(self.codec).decompressor() if self.codec else None
+        async with aiofiles.open(self.path, "rb") as f:
+            while chunk := await f.read(chunk_size):
+                cache_stats.read(self.metadata, len(chunk))
+                chunk = decompressor.decompress(chunk) if decompressor else chunk
+                if chunk:
+                    yield chunk
+
+    def _map(self) -> mmap.mmap | None:
+        with open(self.path, "rb") as f:
+            # Empty files can not be mapped
+            if not os.fstat(f.fileno()).st_size:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read(self) -> bytes:
+        raw = self.path.read_bytes()
+        cache_stats.read(self.metadata, len(raw))
+        return raw
+
+    def _decode(self, raw: bytes) -> bytes:
+        return get_codec(self.codec).decompress(raw) if self.codec else raw
@@ -0,0 +1,123 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import ClassVar, Iterator, override
+
+from fastrag.plugins import PluginBase
+
+
+class IEvictionPolicy(PluginBase, ABC):
+    """Decides which cache entries are evicted first when the cache is over its quota"""
+
+    @abstractmethod
+    def add(self, uri: str) -> None:
+        """Track a new entry
+
+        Args:
+            uri (str): entry URI
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def touch(self, uri: str) -> None:
+        """Register an access to an entry
+
+        Args:
+            uri (str): entry URI
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, uri: str) -> None:
+        """Stop tracking an entry
+
+        Args:
+            uri (str): entry URI
+        """
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def candidates(self) -> Iterator[str]:
+        """Tracked entries, in eviction order. Lazy, the policy must not be changed while
+        iterating.
+
+        Returns:
+            Iterator[str]: entry URIs
+        """
+
+        raise NotImplementedError
+
+
+@dataclass
+class LRUPolicy(IEvictionPolicy):
+    """Evicts the least recently used entries first"""
+
+    supported: ClassVar[str] = "lru"
+
+    _order: OrderedDict[str, None] = field(init=False, repr=False, default_factory=OrderedDict)
+
+    @override
+    def add(self, uri: str) -> None:
+        self._order[uri] = None
+        self._order.move_to_end(uri)
+
+    @override
+    def touch(self, uri: str) -> None:
+        if uri in self._order:
+            self._order.move_to_end(uri)
+
+    @override
+    def remove(self, uri: str) -> None:
+        self._order.pop(uri, None)
+
+    @override
+    def candidates(self) -> Iterator[str]:
+        return iter(self._order)
+
+
+@dataclass
+class LFUPolicy(IEvictionPolicy):
+    """Evicts the least frequently used entries first, oldest first among ties"""
+
+    supported: ClassVar[str] = "lfu"
+
+    _counts: dict[str, int] = field(init=False, repr=False, default_factory=dict)
+    _buckets: defaultdict[int, OrderedDict[str, None]] = field(
+        init=False, repr=False, default_factory=lambda: defaultdict(OrderedDict)
+    )
+
+    @override
+    def add(self, uri: str) -> None:
+        self.remove(uri)
+        self._counts[uri] = 1
+        self._buckets[1][uri] = None
+
+    @override
+    def touch(self, uri: str) -> None:
+        count = self._counts.get(uri)
+        if count is None:
+            return
+
+        self._discard(uri, count)
+        self._counts[uri] = count + 1
+        self._buckets[count + 1][uri] = None
+
+    @override
+    def remove(self, uri: str) -> None:
+        count = self._counts.pop(uri, None)
+        if count is not None:
+            self._discard(uri, count)
+
+    @override
+    def candidates(self) -> Iterator[str]:
+        for count in sorted(self._buckets):
+            yield from self._buckets[count]
+
+    def _discard(self, uri: str, count: int) -> None:
+        bucket = self._buckets[count]
+        bucket.pop(uri, None)
+        if not bucket:
+            del self._buckets[count]
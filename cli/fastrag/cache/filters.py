@@ -2,12 +2,14 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Generic, TypeVar, override
+from typing import Callable, Generic, TypeVar, override
 
 from fastrag.cache.entry import CacheEntry
 
 T = TypeVar("T")
 
+type Predicate[T] = Callable[[T], bool]
+
 
 @dataclass
 class Filter(Generic[T], ABC):
@@ -26,6 +28,16 @@ class Filter(Generic[T], ABC):
 
         raise NotImplementedError
 
+    def compile(self) -> Predicate[T]:
+        """Build a predicate equivalent to `apply`, to be evaluated over many entries. The
+        filter tree is walked once here instead of once per entry.
+
+        Returns:
+            Predicate[T]: entry predicate
+        """
+
+        return self.apply
+
     def __and__(self, other: Filter[T]):
         return AndFilter([self, other])
 
@@ -43,6 +55,32 @@ class AndFilter(Filter[T]):
             return False
         return all(f.apply(entry) for f in self.filters)
 
+    @override
+    def compile(self) -> Predicate[T]:
+        # Plain metadata criteria over distinct keys merge into a single check
+        merged: dict[str, object] | None = None
+        predicates = []
+        for f in self.filters:
+            if isinstance(f, MetadataFilter) and (merged or {}).keys().isdisjoint(f.criteria):
+                merged = (merged or {}) | f.criteria
+            else:
+                predicates.append(f.compile())
+        if merged is not None:
+            predicates.insert(0, MetadataFilter(**merged).compile())
+
+        if not predicates:
+            return lambda entry: False
+        if len(predicates) == 1:
+            return predicates[0]
+
+        def predicate(entry: T) -> bool:
+            for p in predicates:
+                if not p(entry):
+                    return False
+            return True
+
+        return predicate
+
 
 @dataclass
 class OrFilter(Filter[T]):
@@ -54,6 +92,33 @@ class OrFilter(Filter[T]):
             return True
         return any(f.apply(entry) for f in self.filters)
 
+    @override
+    def compile(self) -> Predicate[T]:
+        if not self.filters:
+            return lambda entry: True
+
+        # Alternative values of a single key become a set lookup
+        single = [
+            f for f in self.filters if isinstance(f, MetadataFilter) and len(f.criteria) == 1
+        ]
+        keys = {key for f in single for key in f.criteria}
+        if len(single) == len(self.filters) and len(keys) == 1:
+            (key,) = keys
+            try:
+                return metadata_in(key, frozenset(f.criteria[key] for f in single))
+            except TypeError:
+                pass  # Unhashable expected values
+
+        predicates = [f.compile() for f in self.filters]
+
+        def predicate(entry: T) -> bool:
+            for p in predicates:
+                if p(entry):
+                    return True
+            return False
+
+        return predicate
+
 
 @dataclass(kw_only=True, slots=True)
 class MetadataFilter(Filter[CacheEntry]):
@@ -70,3 +135,30 @@ class MetadataFilter(Filter[CacheEntry]):
             if entry.metadata.get(key) != expected:
                 return False
         return True
+
+    @override
+    def compile(self) -> Predicate[CacheEntry]:
+        criteria = self.criteria
+        if len(criteria) == 1:
+            ((key, expected),) = criteria.items()
+            return lambda entry: bool(entry.metadata) and entry.metadata.get(key) == expected
+
+        # A missing key matches None, which the items subset test would not
+        if None in criteria.values():
+            return self.apply
+
+        items = criteria.items()
+        return lambda entry: bool(entry.metadata) and items <= entry.metadata.items()
+
+
+def metadata_in(key: str, values: frozenset) -> Predicate[CacheEntry]:
+    def predicate(entry: CacheEntry) -> bool:
+        if not entry.metadata:
+            return False
+        try:
+            return entry.metadata.get(key) in values
+        except TypeError:
+            # Unhashable values never equal the hashable expected ones
+            return False
+
+    return predicate
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Iterable
+
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.filters import AndFilter, Filter, MetadataFilter, OrFilter
+
+# Metadata keys the steps select their entries by
+INDEXED = ("step", "strategy", "format", "experiment")
+
+
+@dataclass
+class MetadataIndex:
+    """Inverted indexes (value -> URIs) over some metadata keys, so the entries selected by
+    a filter are found by set operations in time proportional to the result size."""
+
+    keys: Iterable[str] = INDEXED
+
+    _postings: dict[str, dict[Any, set[str]]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._postings = {key: {} for key in self.keys}
+
+    def add(self, uri: str, entry: CacheEntry) -> None:
+        for key, value, postings in self._indexed(entry):
+            postings.setdefault(value, set()).add(uri)
+
+    def remove(self, uri: str, entry: CacheEntry) -> None:
+        for key, value, postings in self._indexed(entry):
+            uris = postings.get(value)
+            if uris is not None:
+                uris.discard(uri)
+                if not uris:
+                    del postings[value]
+
+    def clear(self) -> None:
+        for postings in self._postings.values():
+            postings.clear()
+
+    def lookup(self, filter: Filter) -> set[str] | None:
+        """Narrow down the URIs that may pass the filter. Only the indexed criteria are
+        used, so the candidates must still be checked against the whole filter.
+
+        Args:
+            filter (Filter): filter to look up
+
+        Returns:
+            set[str] | None: candidate URIs, None if the index can not narrow them down
+        """
+
+        match filter:
+            case MetadataFilter(criteria=criteria):
+                sets = [
+                    self._postings[key].get(expected, set())
+                    for key, expected in criteria.items()
+                    if key in self._postings and self._indexable(expected)
+                ]
+            case AndFilter(filters=filters):
+                if not filters:
+                    return set()
+                sets = [s for f in filters if (s := self.lookup(f)) is not None]
+            case OrFilter(filters=filters):
+                sets = [self.lookup(f) for f in filters]
+                if not sets or any(s is None for s in sets):
+                    return None
+                return set().union(*sets)
+            case _:
+                return None
+
+        if not sets:
+            return None
+
+        # Intersecting from the smallest set bounds the work by the result size
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def _indexed(self, entry: CacheEntry) -> Iterable[tuple[str, Any, dict[Any, set[str]]]]:
+        metadata = entry.metadata or {}
+        for key, postings in self._postings.items():
+            value = metadata.get(key)
+            if self._indexable(value):
+                yield key, value, postings
+
+    @staticmethod
+    def _indexable(value: Any) -> bool:
+        # None also matches missing keys, which are not indexed
+        if value is None or not isinstance(value, Hashable):
+            return False
+        try:
+            hash(value)
+        except TypeError:
+            return False
+        return True
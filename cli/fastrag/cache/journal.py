@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import orjson
+
+from fastrag.cache.entry import CacheEntry
+
+type Record = tuple[str, CacheEntry | None]
+
+
+def atomic_write(path: Path, content: bytes) -> None:
+    """Write the given content into path through a temporary file and a rename, so
+    readers never observe a half-written file.
+
+    Args:
+        path (Path): destination path
+        content (bytes): contents to write
+    """
+
+    # Unique, as other instances on the same directory may write the same file
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@dataclass
+class MetadataJournal:
+    """Append-only metadata log backed by sharded snapshots.
+
+    Every change is appended to `journal.jsonl` as a `{"uri", "entry"}` record, where a
+    `null` entry is a deletion. Once the journal grows past `compact_every` records the
+    touched snapshot shards are rewritten and the journal is truncated.
+    """
+
+    base: Path
+    shards: int = 16
+    compact_every: int = 10_000
+
+    _journal: Path = field(init=False, repr=False)
+    _records: int = field(init=False, default=0, repr=False)
+    _dirty: set[int] = field(init=False, default_factory=set, repr=False)
+
+    def __post_init__(self) -> None:
+        self.base.mkdir(parents=True, exist_ok=True)
+        self._journal = self.base / "journal.jsonl"
+        self._journal.touch(mode=0o770, exist_ok=True)
+
+    def shard(self, uri: str) -> int:
+        return int(hashlib.sha256(uri.encode()).hexdigest()[:8], 16) % self.shards
+
+    def shard_path(self, shard: int) -> Path:
+        return self.base / f"shard-{shard:02x}.json"
+
+    def load(self) -> dict[str, CacheEntry]:
+        """Load the snapshot shards and replay the journal on top of them. A truncated
+        trailing record (crash in the middle of an append) is discarded.
+
+        Returns:
+            dict[str, CacheEntry]: URI to entry mapping
+        """
+
+        raw: dict[str, dict] = {}
+        for shard in range(self.shards):
+            path = self.shard_path(shard)
+            if path.exists():
+                raw.update(orjson.loads(path.read_bytes()))
+
+        data = self._journal.read_bytes()
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                break
+
+            uri, entry = record["uri"], record["entry"]
+            if entry is None:
+                raw.pop(uri, None)
+            else:
+                raw[uri] = entry
+
+            self._dirty.add(self.shard(uri))
+            self._records += 1
+            offset += len(line)
+
+        if offset != len(data):
+            os.truncate(self._journal, offset)
+
+        return {k: CacheEntry.from_dict(v) for k, v in raw.items()}
+
+    def import_legacy(self, metadata: dict[str, CacheEntry]) -> None:
+        """Write a whole metadata mapping as the current snapshot
+
+        Args:
+            metadata (dict[str, CacheEntry]): entries to store
+        """
+
+        self._dirty = set(range(self.shards))
+        self._compact(metadata)
+
+    def needs_compaction(self) -> bool:
+        return self._records >= self.compact_every
+
+    async def append(self, records: list[Record]) -> None:
+        """Append the given records to the journal
+
+        Args:
+            records (list[Record]): (uri, entry) pairs, `None` entries are deletions
+        """
+
+        if not records:
+            return
+
+        lines = b"".join(
+            orjson.dumps({"uri": uri, "entry": entry.to_dict() if entry else None}) + b"\n"
+            for uri, entry in records
+        )
+        self._dirty.update(self.shard(uri) for uri, _ in records)
+        self._records += len(records)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._append, lines)
+
+    async def compact(self, metadata: dict[str, CacheEntry]) -> None:
+        """Rewrite the shards touched since the last compaction and truncate the journal.
+        The caller must guarantee no appends happen concurrently.
+
+        Args:
+            metadata (dict[str, CacheEntry]): current entries
+        """
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._compact, dict(metadata))
+
+    def _append(self, lines: bytes) -> None:
+        with open(self._journal, "ab") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, metadata: dict[str, CacheEntry]) -> None:
+        shards: dict[int, dict[str, dict]] = {s: {} for s in self._dirty}
+        for uri, entry in metadata.items():
+            shard = self.shard(uri)
+            if shard in shards:
+                shards[shard][uri] = entry.to_dict()
+
+        for shard, entries in shards.items():
+            atomic_write(self.shard_path(shard), orjson.dumps(entries))
+
+        # Shards are durable, so the journal records are no longer needed
+        os.truncate(self._journal, 0)
+        self._dirty.clear()
+        self._records = 0
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Any, Iterable
+
+import orjson
+
+from fastrag.cache.entry import CacheEntry
+
+type Lineage = dict[str, Any]
+
+
+async def lineage(inputs: Iterable[CacheEntry], **params: Any) -> Lineage:
+    """Describe how a derived entry is produced, to be stored under the `lineage` key of its
+    metadata. `get_or_create` rebuilds the entry when the stored lineage differs.
+
+    Args:
+        inputs (Iterable[CacheEntry]): entries the derived entry is computed from
+        **params (Any): parameters of the task producing it, JSON serializable
+
+    Returns:
+        Lineage: digests of the inputs contents and parameters
+    """
+
+    # Entries of previous versions did not record their digest
+    digests = [e.digest or await stream_digest(e) for e in inputs]
+
+    # Normalized as it will be read back from the metadata (tuples become lists, ...)
+    return orjson.loads(orjson.dumps({"inputs": digests, "params": params}))
+
+
+async def stream_digest(entry: CacheEntry) -> str:
+    """Digest of the decoded contents of an entry, hashed as they are read
+
+    Args:
+        entry (CacheEntry): hashed entry
+
+    Returns:
+        str: sha256 hex digest
+    """
+
+    digest = hashlib.sha256()
+    async for chunk in entry.iter_content():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_stale(entry: CacheEntry, metadata: dict | None) -> bool:
+    """Check if an entry was derived from other inputs or parameters than the requested ones
+
+    Args:
+        entry (CacheEntry): cached entry
+        metadata (dict | None): metadata of the `get_or_create` call
+
+    Returns:
+        bool: if the entry must be rebuilt
+    """
+
+    expected = (metadata or {}).get("lineage")
+    return expected is not None and expected != (entry.metadata or {}).get("lineage")
+
+
+def is_renewable(entry: CacheEntry, metadata: dict | None) -> bool:
+    """Check if an outdated entry can be renewed as it is, because it was derived from the
+    same inputs and parameters as the requested ones
+
+    Args:
+        entry (CacheEntry): cached entry, outdated or not
+        metadata (dict | None): metadata of the `get_or_create` call
+
+    Returns:
+        bool: if the entry is still valid
+    """
+
+    expected = (metadata or {}).get("lineage")
+    return expected is not None and expected == (entry.metadata or {}).get("lineage")
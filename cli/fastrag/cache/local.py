@@ -1,17 +1,44 @@
 import asyncio
 import hashlib
-import inspect
-import json
+import os
 import shutil
-from dataclasses import InitVar, dataclass, field
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import InitVar, dataclass, field, replace
 from pathlib import Path
-from typing import ClassVar, Iterable, override
-
-import aiofiles
-
-from fastrag.cache.cache import CacheEntry, ContentsCallable, ICache
+from typing import AsyncIterable, ClassVar, Container, Iterable, Iterator, override
+
+import orjson
+
+from fastrag.cache.cache import (
+    VALIDATORS,
+    CacheEntry,
+    ContentsCallable,
+    CreateItem,
+    GetOrCreateItem,
+    ICache,
+    resolve,
+)
+from fastrag.cache.compression import get_codec
+from fastrag.cache.content import content_cache
+from fastrag.cache.eviction import IEvictionPolicy
 from fastrag.cache.filters import Filter
-from fastrag.cache.utils import PosixTimestamp, timestamp
+from fastrag.cache.index import MetadataIndex
+from fastrag.cache.journal import MetadataJournal, Record
+from fastrag.cache.lineage import is_renewable, is_stale
+from fastrag.cache.stats import cache_stats
+from fastrag.cache.utils import (
+    PosixTimestamp,
+    content_digest,
+    spool_temp,
+    timestamp,
+    unlink_many,
+    write_temp,
+)
+from fastrag.plugins import inject
 
 type Metadata = dict[str, CacheEntry]
 
@@ -20,52 +47,96 @@ def is_outdated(time: PosixTimestamp, lifespan: int) -> bool:
     return time + lifespan < timestamp()
 
 
+def is_expired(entry: CacheEntry, lifespan: int) -> bool:
+    """Check if an entry can be deleted. Outdated entries that can be revalidated are kept
+    for another lifespan, to be renewed instead of regenerated.
+
+    Args:
+        entry (CacheEntry): cached entry
+        lifespan (int): cache lifespan in seconds
+
+    Returns:
+        bool: if the entry is of no more use
+    """
+
+    if not is_outdated(entry.timestamp, lifespan):
+        return False
+
+    metadata = entry.metadata or {}
+    renewable = any(metadata.get(key) is not None for key in VALIDATORS)
+    return not renewable or is_outdated(entry.timestamp, 2 * lifespan)
+
+
 @dataclass(frozen=True)
 class Paths:
     metadata: Path = field(init=False, repr=False)
+    legacy_metadata: Path = field(init=False, repr=False)
     data: Path = field(init=False, repr=False)
 
     base: InitVar[Path]
 
     def __post_init__(self, base: Path) -> None:
-        object.__setattr__(self, "metadata", base / "metadata.json")
+        # Blob paths key the reference counts, so new entries must compare equal to the
+        # loaded ones, which are stored resolved (see `CacheEntry.to_dict`)
+        base = base.resolve()
+        object.__setattr__(self, "metadata", base / "metadata")
+        object.__setattr__(self, "legacy_metadata", base / "metadata.json")
         object.__setattr__(self, "data", base / "cache")
 
-        self.metadata.parent.mkdir(exist_ok=True)
+        self.metadata.mkdir(parents=True, exist_ok=True)
         self.data.mkdir(exist_ok=True)
 
-        self.metadata.touch(mode=0o770, exist_ok=True)
-
 
 @dataclass
 class LocalCache(ICache):
-    base: ClassVar[Path] = Path(".fastrag")
     supported: ClassVar[str] = "local"
 
-    _dirty: bool = field(init=False, default=False, repr=False)
+    base: Path = Path(".fastrag")
+    compact_every: int = 10_000
+    deduplicate: bool = False
+    compression: str | None = None
+    compression_level: int | None = None
+    content_cache_size: int | None = None
+
+    _refs: Counter[Path] = field(init=False, repr=False, default_factory=Counter)
+    _pins: Counter[str] = field(init=False, repr=False, default_factory=Counter)
+    _size: int = field(init=False, repr=False, default=0)
+    _policy: IEvictionPolicy = field(init=False, repr=False)
+    _pending: dict[str, CacheEntry | None] = field(init=False, repr=False, default_factory=dict)
     _paths: Paths = field(init=False, repr=False)
+    _journal: MetadataJournal = field(init=False, repr=False)
     _lock: asyncio.Lock = field(init=False, repr=False, default_factory=asyncio.Lock)
-    metadata: Metadata = field(init=False, repr=False, default_factory=lambda: dict)
+    _flush_lock: asyncio.Lock = field(init=False, repr=False, default_factory=asyncio.Lock)
+    _loading: Future[Metadata] = field(init=False, repr=False, default_factory=Future)
+    _sweeper: asyncio.Task | None = field(init=False, repr=False, default=None)
+    _metadata: Metadata = field(init=False, repr=False, default_factory=dict)
+    _indexes: MetadataIndex = field(init=False, repr=False, default_factory=MetadataIndex)
 
     def __post_init__(self) -> None:
-        # Load metadata from file
-        metadata = {}
-
-        paths = Paths(self.base)
-
-        raw = paths.metadata.read_text()
-        if raw:
-            raw = json.loads(raw)
-            metadata = {k: CacheEntry.from_dict(v) for k, v in raw.items()}
-
-        self._paths = paths
-        self.metadata = metadata
-
-        self._delete_invalid()
+        if self.compression:
+            get_codec(self.compression).check(self.compression_level)
+        if self.content_cache_size is not None:
+            content_cache.resize(self.content_cache_size)
+
+        self.base = Path(self.base)
+        self._paths = Paths(self.base)
+        self._journal = MetadataJournal(self._paths.metadata, compact_every=self.compact_every)
+        self._policy = inject(IEvictionPolicy, self.eviction)
+
+        # Metadata is loaded in the background, so constructing the cache (`serve` builds
+        # it at startup) does not wait for it. Every access waits for it to be complete,
+        # including `clean`, which needs the outdated entries too.
+        threading.Thread(target=self._load, name="LocalCache.load", daemon=True).start()
+
+    @property
+    def metadata(self) -> Metadata:
+        self._loading.result()
+        return self._metadata
 
     @override
     def is_present(self, uri: str) -> bool:
-        entry = self.metadata.get(uri, None)
+        self._loading.result()
+        entry = self._metadata.get(uri, None)
         return entry is not None and not is_outdated(entry.timestamp, self.lifespan)
 
     @override
@@ -75,18 +146,98 @@ class LocalCache(ICache):
         contents: bytes,
         metadata: dict | None = None,
     ) -> CacheEntry:
-        digest = hashlib.sha256(uri.encode()).hexdigest()
+        (entry,) = await self.create_many([(uri, contents, metadata)])
+        return entry
+
+    @override
+    async def create_many(self, items: Iterable[CreateItem]) -> list[CacheEntry]:
+        await self._ready()
+        items = list(items)
+        prepared = await asyncio.gather(*(self._prepare(*item) for item in items))
+
+        # Blobs are written to temporary files outside of the critical section, which only
+        # renames them into place and updates the metadata
+        staged = await asyncio.gather(
+            *(self._stage(entry, contents) for entry, contents in prepared),
+            return_exceptions=True,
+        )
+        if errors := [s for s in staged if isinstance(s, BaseException)]:
+            for tmp in staged:
+                if isinstance(tmp, Path):
+                    tmp.unlink(missing_ok=True)
+            raise errors[0]
+
+        await self._commit(
+            [
+                (uri, entry, contents, tmp)
+                for (uri, _, _), (entry, contents), tmp in zip(items, prepared, staged)
+            ]
+        )
+        return [entry for entry, _ in prepared]
+
+    @override
+    async def create_stream(
+        self,
+        uri: str,
+        chunks: AsyncIterable[bytes],
+        metadata: dict | None = None,
+    ) -> CacheEntry:
+        # Compression needs the whole contents
+        if self.compression:
+            return await super().create_stream(uri, chunks, metadata)
+
+        await self._ready()
+        tmp, digest, size = await spool_temp(self._paths.data, chunks)
+        name = digest if self.deduplicate else hashlib.sha256(uri.encode()).hexdigest()
         entry = CacheEntry(
-            path=self._paths.data / digest,
+            path=self._paths.data / name,
             metadata=metadata,
+            size=size,
+            codec=None,
+            digest=digest,
         )
+        await self._commit([(uri, entry, None, tmp)])
+        return entry
 
-        async with self._lock:
-            self.metadata[uri] = entry
-            await self._save(entry.path, contents)
-            self._dirty = True
+    async def _commit(
+        self, staged: list[tuple[str, CacheEntry, bytes | None, Path | None]]
+    ) -> None:
+        """Rename the staged blobs into place and record their entries
 
-        return entry
+        Args:
+            staged (list[tuple[str, CacheEntry, bytes | None, Path | None]]): URI, entry,
+            contents and temporary file of each new entry. Either the contents or the
+            temporary file must be given.
+        """
+
+        discarded: list[Path] = []
+        async with self._lock:
+            for uri, entry, contents, tmp in staged:
+                previous = self._metadata.pop(uri, None)
+                if previous is not None:
+                    self._indexes.remove(uri, previous)
+                    self._release(previous)
+
+                if self.deduplicate and self._refs[entry.path]:
+                    if tmp is not None:
+                        discarded.append(tmp)
+                else:
+                    # The blob was shared when staged, but has been released since
+                    tmp = tmp or await write_temp(entry.path, contents)
+                    os.replace(tmp, entry.path)
+                    self._size += entry.size
+                    cache_stats.written(entry.metadata, entry.size)
+
+                self._refs[entry.path] += 1
+                self._metadata[uri] = entry
+                self._indexes.add(uri, entry)
+                self._policy.add(uri)
+                self._pending[uri] = entry
+
+            self._evict(keep={uri for uri, *_ in staged})
+
+        for tmp in discarded:
+            tmp.unlink(missing_ok=True)
 
     @override
     async def get_or_create(
@@ -95,59 +246,148 @@ class LocalCache(ICache):
         contents: ContentsCallable,
         metadata: dict | None = None,
     ) -> tuple[bool, CacheEntry]:
-        entry = await self.get(uri)
-        if entry:
-            # If metadata.experiment is present, update it !
-            experiment = metadata.get("experiment", None)
-            if experiment and experiment is not entry.metadata["experiment"]:
-                cached = self.metadata[uri]
-                cached.metadata["experiment"] = experiment
-                self.metadata[uri] = cached
-                self._dirty = True
-
-            return True, entry
-
-        result = contents()
-        if inspect.isawaitable(result):
-            data = await result
-        else:
-            data = result
+        (result,) = await self.get_or_create_many([(uri, contents, metadata)])
+        return result
 
-        return False, await self.create(uri, data, metadata)
+    @override
+    async def get_or_create_many(
+        self, items: Iterable[GetOrCreateItem]
+    ) -> list[tuple[bool, CacheEntry]]:
+        await self._ready()
+        items = list(items)
+        results: list[tuple[bool, CacheEntry] | None] = [None] * len(items)
+
+        missing = []
+        for idx, (uri, _, metadata) in enumerate(items):
+            entry = await self.get(uri)
+            if entry is None and (outdated := await self.peek(uri)):
+                # Derived from unchanged inputs, regenerating it would give the same
+                if is_renewable(outdated, metadata):
+                    entry = await self.renew(uri)
+
+            if entry and not is_stale(entry, metadata):
+                cache_stats.hit(entry.metadata)
+                results[idx] = (True, self._update_experiment(uri, entry, metadata))
+            else:
+                cache_stats.miss(metadata)
+                missing.append(idx)
+
+        data = await asyncio.gather(*(resolve(items[idx][1]) for idx in missing))
+        created = await self.create_many(
+            (items[idx][0], contents, items[idx][2]) for idx, contents in zip(missing, data)
+        )
+        for idx, entry in zip(missing, created):
+            results[idx] = (False, entry)
+
+        return results
 
     @override
     async def get(self, uri: str) -> CacheEntry | None:
-        return self.metadata.get(uri) if self.is_present(uri) else None
+        await self._ready()
+        if not self.is_present(uri):
+            return None
+
+        self._policy.touch(uri)
+        return self._metadata.get(uri)
+
+    @override
+    async def peek(self, uri: str) -> CacheEntry | None:
+        await self._ready()
+        return self._metadata.get(uri)
+
+    @override
+    async def renew(self, uri: str, metadata: dict | None = None) -> CacheEntry | None:
+        await self._ready()
+        async with self._lock:
+            entry = self._metadata.get(uri)
+            if entry is None:
+                return None
+
+            renewed = replace(
+                entry,
+                timestamp=timestamp(),
+                metadata=(entry.metadata or {}) | metadata if metadata else entry.metadata,
+            )
+            self._indexes.remove(uri, entry)
+            self._indexes.add(uri, renewed)
+            self._metadata[uri] = renewed
+            self._pending[uri] = renewed
+            self._policy.touch(uri)
+            return renewed
 
     @override
     async def get_entries(
         self, filter: Filter | None = None
     ) -> Iterable[tuple[str, CacheEntry]]:
-        if not filter:
-            return [(k, e) for k, e in self.metadata.items()]
-        return [(k, e) for k, e in self.metadata.items() if filter.apply(e)]
+        await self._ready()
+        # Outdated entries kept to be renewed are not served
+        return [
+            (uri, entry)
+            for uri, entry in self._select(filter)
+            if not is_outdated(entry.timestamp, self.lifespan)
+        ]
+
+    @property
+    def deduplicated(self) -> int:
+        """Bytes saved by sharing content-addressed blobs between entries"""
+
+        total = sum(e.size or 0 for e in self.metadata.values())
+        unique = {e.path: e.size or 0 for e in self.metadata.values()}
+        return total - sum(unique.values())
 
     @override
-    def clean(self) -> int:
-        paths = self.base.rglob("*")
-        size = sum(p.stat().st_size for p in paths if p.is_file())
-        shutil.rmtree(self.base)
-        return size
+    async def clean(self, filter: Filter | None = None) -> int:
+        loop = asyncio.get_running_loop()
+        if filter is None:
+            outdated = await self._loaded()
+            if self._sweeper is not None:
+                self._sweeper.cancel()
+
+            entries = (*outdated.values(), *self._metadata.values())
+            blobs = {e.path: e.size or 0 for e in entries}
+            await loop.run_in_executor(None, self._wipe)
+            return sum(blobs.values())
+
+        await self._ready()
+        async with self._lock:
+            released: dict[Path, int] = {}
+            for uri, entry in self._select(filter):
+                if self._remove(uri, unlink=False):
+                    released[entry.path] = entry.size or 0
+
+            # Under the lock, so no create can reuse a blob while it is being deleted
+            await loop.run_in_executor(None, unlink_many, list(released))
+
+        await self.flush()
+        return sum(released.values())
 
     @override
     async def flush(self) -> None:
-        async with self._lock:
-            if not self._dirty:
-                return
-            raw = {k: v.to_dict() for k, v in self.metadata.items()}
-            with open(self._paths.metadata, "w") as f:
-                json.dump(raw, f, indent=2)
-            self._dirty = False
+        await self._ready()
+
+        # Journal writes are serialized on their own, creates are only blocked for the swap
+        async with self._flush_lock:
+            start = time.perf_counter()
+            async with self._lock:
+                if not self._pending:
+                    return
+
+                records: list[Record] = list(self._pending.items())
+                self._pending = {}
+
+            await self._journal.append(records)
+            if self._journal.needs_compaction():
+                await self._journal.compact(self._metadata)
+
+            cache_stats.flushed(time.perf_counter() - start, len(self._metadata), self._size)
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
+        await self._ready()
+        if self._sweeper is not None:
+            await self._sweeper
         await self.flush()
 
     async def autosave(self, interval: int = 5):
@@ -155,21 +395,240 @@ class LocalCache(ICache):
             await asyncio.sleep(interval)
             await self.flush()
 
-    def _delete_invalid(self) -> None:
-        outdated = [
-            (h, v.path)
-            for h, v in self.metadata.items()
-            if is_outdated(v.timestamp, self.lifespan)
-        ]
-        if not outdated:
+    def _select(self, filter: Filter | None) -> list[tuple[str, CacheEntry]]:
+        if not filter:
+            return list(self._metadata.items())
+
+        predicate = filter.compile()
+        candidates = self._indexes.lookup(filter)
+        if candidates is None:
+            return [(k, e) for k, e in self._metadata.items() if predicate(e)]
+        return [(k, e) for k in candidates if predicate(e := self._metadata[k])]
+
+    def _update_experiment(
+        self, uri: str, entry: CacheEntry, metadata: dict | None
+    ) -> CacheEntry:
+        # If metadata.experiment is present, update it !
+        experiment = (metadata or {}).get("experiment", None)
+        if not experiment or experiment == (entry.metadata or {}).get("experiment"):
+            return entry
+
+        updated = replace(entry, metadata=(entry.metadata or {}) | {"experiment": experiment})
+        self._indexes.remove(uri, entry)
+        self._indexes.add(uri, updated)
+        self._metadata[uri] = updated
+        self._pending[uri] = updated
+        return updated
+
+    async def _prepare(
+        self, uri: str, contents: bytes, metadata: dict | None
+    ) -> tuple[CacheEntry, bytes]:
+        # Content-addressed blobs are shared between every URI with the same contents
+        digest = content_digest(contents)
+        contents, codec = await self._compress(contents)
+        if self.deduplicate:
+            # The codec is chosen per write, a shared blob must be read with its own
+            name = f"{digest}.{codec}" if codec else digest
+        else:
+            name = hashlib.sha256(uri.encode()).hexdigest()
+        entry = CacheEntry(
+            path=self._paths.data / name,
+            metadata=metadata,
+            size=len(contents),
+            codec=codec,
+            digest=digest,
+        )
+        return entry, contents
+
+    async def _compress(self, contents: bytes) -> tuple[bytes, str | None]:
+        if not self.compression:
+            return contents, None
+
+        codec = get_codec(self.compression)
+        loop = asyncio.get_running_loop()
+        compressed = await loop.run_in_executor(
+            None, codec.compress, contents, self.compression_level
+        )
+
+        # Already compressed formats (PDF, DOCX, ...) are kept as they are
+        if len(compressed) >= len(contents):
+            return contents, None
+        return compressed, codec.name
+
+    @contextmanager
+    def pinned(self, uris: Iterable[str]) -> Iterator[None]:
+        """Exempt the entries of the given URIs from eviction while in the context, so a
+        multi-step read does not evict the entries of its earlier steps. The cache may go
+        over its quota meanwhile.
+
+        Args:
+            uris (Iterable[str]): URIs to keep
+        """
+
+        uris = list(uris)
+        self._pins.update(uris)
+        try:
+            yield
+        finally:
+            for uri in uris:
+                self._pins[uri] -= 1
+                if not self._pins[uri]:
+                    del self._pins[uri]
+
+    def _evict(self, keep: Container[str]) -> None:
+        """Remove entries in the eviction policy order until the cache fits its quota
+
+        Args:
+            keep (Container[str]): URIs that must not be evicted (the ones just created)
+        """
+
+        if self.max_size is None:
             return
 
-        for h, item in outdated:
-            item.unlink(missing_ok=True)
-            self.metadata.pop(h)
+        while self._size > self.max_size:
+            excess = self._size - self.max_size
+            victims = []
+            for uri in self._policy.candidates():
+                if uri in keep or self._pins[uri]:
+                    continue
 
-        self._dirty = True
+                victims.append(uri)
+                excess -= self._metadata[uri].size or 0
+                if excess <= 0:
+                    break
+
+            if not victims:
+                return
+
+            for uri in victims:
+                self._remove(uri)
+
+    def _remove(self, uri: str, unlink: bool = True) -> Path | None:
+        entry = self._metadata.pop(uri)
+        self._indexes.remove(uri, entry)
+        self._policy.remove(uri)
+        self._pending[uri] = None
+        return self._release(entry, unlink)
+
+    def _release(self, entry: CacheEntry, unlink: bool = True) -> Path | None:
+        """Drop a reference to the blob of an entry, deleting it if it was the last one
+
+        Args:
+            entry (CacheEntry): released entry
+            unlink (bool, optional): delete the unreferenced blob, otherwise it is left to
+            the caller. Defaults to True.
+
+        Returns:
+            Path | None: blob path if it is no longer referenced
+        """
+
+        self._refs[entry.path] -= 1
+        if self._refs[entry.path] > 0:
+            return None
+
+        del self._refs[entry.path]
+        self._size -= entry.size or 0
+        if unlink:
+            entry.path.unlink(missing_ok=True)
+        return entry.path
+
+    def _stat(self, path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    async def _stage(self, entry: CacheEntry, contents: bytes) -> Path | None:
+        # No need to write contents that are already stored
+        if self.deduplicate and self._refs[entry.path]:
+            return None
+        return await write_temp(entry.path, contents)
+
+    def _load(self) -> None:
+        try:
+            self._loading.set_result(self._read_metadata())
+        except BaseException as e:
+            self._loading.set_exception(e)
+
+    def _wipe(self) -> None:
+        # Blobs are the bulk of the files, they are deleted concurrently before the tree
+        unlink_many(Path(e.path) for e in os.scandir(self._paths.data))
+        shutil.rmtree(self.base)
 
-    async def _save(self, path: Path, content: bytes) -> None:
-        async with aiofiles.open(path, "wb+") as f:
-            await f.write(content)
+    def _read_metadata(self) -> Metadata:
+        """Load the metadata and set up the derived state, only run by the loader thread.
+
+        Returns:
+            Metadata: outdated entries, already left out, whose blobs are to be deleted
+        """
+
+        # Load metadata from the snapshot shards and the journal
+        metadata = self._journal.load()
+
+        # Migrate the single-file metadata of previous versions
+        # Another instance on the same directory may be migrating it too, importing the
+        # same entries twice is harmless
+        legacy_path = self._paths.legacy_metadata
+        try:
+            raw = legacy_path.read_bytes()
+        except FileNotFoundError:
+            raw = None
+        if raw is not None:
+            if raw:
+                legacy = {k: CacheEntry.from_dict(v) for k, v in orjson.loads(raw).items()}
+                metadata = legacy | metadata
+                self._journal.import_legacy(metadata)
+            legacy_path.unlink(missing_ok=True)
+
+        outdated = {}
+        for uri, entry in list(metadata.items()):
+            if is_expired(entry, self.lifespan):
+                outdated[uri] = metadata.pop(uri)
+            elif entry.size is None:
+                # Entries of previous versions did not record their size
+                metadata[uri] = replace(entry, size=self._stat(entry.path))
+                self._pending[uri] = metadata[uri]
+
+        self._metadata = metadata
+        for uri, entry in metadata.items():
+            self._indexes.add(uri, entry)
+        self._refs = Counter(entry.path for entry in metadata.values())
+        self._size = sum({e.path: e.size for e in metadata.values()}.values())
+
+        # Without access history, the oldest entries are the first to go
+        for uri, _ in sorted(metadata.items(), key=lambda item: item[1].timestamp):
+            self._policy.add(uri)
+
+        return outdated
+
+    async def _loaded(self) -> Metadata:
+        if not self._loading.done():
+            await asyncio.wrap_future(self._loading)
+        return self._loading.result()
+
+    async def _ready(self) -> None:
+        outdated = await self._loaded()
+        if outdated and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep(outdated))
+
+    async def _sweep(self, outdated: Metadata) -> None:
+        """Delete the blobs of the entries that were outdated at startup, in small batches
+        so creates are not held back. Their removal is only journaled once the blobs are
+        gone, so an interrupted sweep is resumed on the next startup.
+
+        Args:
+            outdated (Metadata): outdated entries
+        """
+
+        loop = asyncio.get_running_loop()
+        items = list(outdated.items())
+        for start in range(0, len(items), 256):
+            batch = items[start : start + 256]
+            async with self._lock:
+                # Blobs may have been reused by entries created since the startup
+                paths = {e.path for _, e in batch if not self._refs[e.path]}
+                await loop.run_in_executor(None, unlink_many, paths)
+
+                for uri, _ in batch:
+                    if uri not in self._metadata:
+                        self._pending[uri] = None
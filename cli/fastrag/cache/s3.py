@@ -0,0 +1,510 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, ClassVar, Iterable, override
+
+import orjson
+
+from fastrag.cache.cache import (
+    CacheEntry,
+    ContentsCallable,
+    CreateItem,
+    GetOrCreateItem,
+    ICache,
+    resolve,
+)
+from fastrag.cache.filters import Filter
+from fastrag.cache.index import MetadataIndex
+from fastrag.cache.lineage import is_renewable, is_stale
+from fastrag.cache.local import LocalCache, is_expired, is_outdated
+from fastrag.cache.stats import cache_stats
+from fastrag.cache.utils import timestamp
+from fastrag.helpers.utils import parse_to_bytes
+
+type Index = dict[str, CacheEntry]
+
+
+def segment_id() -> str:
+    # Sortable by creation time, unique between writers
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+
+
+def key_id(key: str) -> str:
+    # <prefix>/index/<kind>-<id>.<ext>
+    return key.rsplit("/", 1)[1].split("-", 1)[1].split(".", 1)[0]
+
+
+def to_record(entry: CacheEntry) -> dict:
+    # Blob paths are local to each machine, they are not shared
+    return {
+        "timestamp": entry.timestamp,
+        "metadata": entry.metadata,
+        "size": entry.size,
+        "digest": entry.digest,
+    }
+
+
+@dataclass
+class S3Cache(ICache):
+    """Cache shared between machines through an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    Blobs are stored under `<prefix>/blobs/` and the metadata as an append-only log of
+    segments under `<prefix>/index/`, one per flush and writer, periodically merged into a
+    snapshot. Blobs are downloaded on demand into a local `LocalCache` tier, bounded by
+    `local_max_size` (`max_size` if not given), which is what the returned entries point
+    to. The index is loaded in the background, every access waits for it.
+    """
+
+    supported: ClassVar[str] = "s3"
+
+    bucket: str = ""
+    prefix: str = "fastrag"
+    endpoint_url: str | None = None
+    region_name: str | None = None
+    aws_access_key_id: str | None = None
+    aws_secret_access_key: str | None = None
+    local_base: str = ".fastrag/s3"
+    local_max_size: str | None = None  # local tier quota, such as "5GB"
+    transfers: int = 16
+    compact_every: int = 64
+    compact_grace: int = 600  # seconds, segments younger than it are never compacted
+
+    _client: Any = field(init=False, repr=False)
+    _tier: LocalCache = field(init=False, repr=False)
+    _index: Index = field(init=False, repr=False, default_factory=dict)
+    _indexes: MetadataIndex = field(init=False, repr=False, default_factory=MetadataIndex)
+    _pending: dict[str, CacheEntry | None] = field(init=False, repr=False, default_factory=dict)
+    _segments: int = field(init=False, repr=False, default=0)
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+    _flush_lock: asyncio.Lock = field(init=False, repr=False, default_factory=asyncio.Lock)
+    _loading: Future[None] = field(init=False, repr=False, default_factory=Future)
+
+    def __post_init__(self) -> None:
+        if not self.bucket:
+            raise ValueError("S3Cache requires a bucket")
+
+        try:
+            import boto3
+        except ImportError as e:
+            raise ImportError("S3Cache requires boto3, install fastrag-cli[s3]") from e
+
+        self.prefix = self.prefix.strip("/")
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=self.endpoint_url,
+            region_name=self.region_name,
+            aws_access_key_id=self.aws_access_key_id,
+            aws_secret_access_key=self.aws_secret_access_key,
+        )
+        self._tier = LocalCache(
+            lifespan=self.lifespan,
+            max_size=parse_to_bytes(self.local_max_size)
+            if self.local_max_size
+            else self.max_size,
+            eviction=self.eviction,
+            base=Path(self.local_base),
+        )
+        self._semaphore = asyncio.Semaphore(self.transfers)
+
+        # Listing and reading the index takes round trips to the bucket, constructing the
+        # cache does not wait for them
+        threading.Thread(target=self._start, name="S3Cache.load", daemon=True).start()
+
+    @override
+    def is_present(self, uri: str) -> bool:
+        self._loading.result()
+        entry = self._index.get(uri, None)
+        return entry is not None and not is_outdated(entry.timestamp, self.lifespan)
+
+    @override
+    async def create(
+        self,
+        uri: str,
+        contents: bytes,
+        metadata: dict | None = None,
+    ) -> CacheEntry:
+        (entry,) = await self.create_many([(uri, contents, metadata)])
+        return entry
+
+    @override
+    async def create_many(self, items: Iterable[CreateItem]) -> list[CacheEntry]:
+        items = list(items)
+        await self._ready()
+        entries = await self._tier.create_many(items)
+
+        # Repeated URIs in a batch keep their last contents
+        writes = {uri: contents for uri, contents, _ in items}
+        await asyncio.gather(*(self._put(self._blob(k), data) for k, data in writes.items()))
+
+        # Blobs are uploaded before the index references them
+        for (uri, _, _), entry in zip(items, entries):
+            self._set(uri, replace(entry, path=Path(self._blob(uri))))
+            self._pending[uri] = entry
+
+        return entries
+
+    @override
+    async def get_or_create(
+        self,
+        uri: str,
+        contents: ContentsCallable,
+        metadata: dict | None = None,
+    ) -> tuple[bool, CacheEntry]:
+        (result,) = await self.get_or_create_many([(uri, contents, metadata)])
+        return result
+
+    @override
+    async def get_or_create_many(
+        self, items: Iterable[GetOrCreateItem]
+    ) -> list[tuple[bool, CacheEntry]]:
+        items = list(items)
+        await self._ready()
+        results: list[tuple[bool, CacheEntry] | None] = [None] * len(items)
+
+        # Derived from unchanged inputs, regenerating them would give the same
+        for uri, _, metadata in items:
+            outdated = self._index.get(uri)
+            if outdated and not self.is_present(uri) and is_renewable(outdated, metadata):
+                await self.renew(uri)
+
+        present = [
+            idx
+            for idx, (uri, _, metadata) in enumerate(items)
+            if self.is_present(uri) and not is_stale(self._index[uri], metadata)
+        ]
+        # The created entries must not evict the local copies of the found ones
+        found_uris = [items[idx][0] for idx in present]
+        with self._tier.pinned(found_uris):
+            found = await self._download(found_uris)
+            for idx, entry in zip(present, found):
+                uri, _, metadata = items[idx]
+                cache_stats.hit(entry.metadata)
+                results[idx] = (True, self._update_experiment(uri, entry, metadata))
+
+            missing = [idx for idx, result in enumerate(results) if result is None]
+            for idx in missing:
+                cache_stats.miss(items[idx][2])
+            data = await asyncio.gather(*(resolve(items[idx][1]) for idx in missing))
+            created = await self.create_many(
+                (items[idx][0], contents, items[idx][2]) for idx, contents in zip(missing, data)
+            )
+        for idx, entry in zip(missing, created):
+            results[idx] = (False, entry)
+
+        return results
+
+    @override
+    async def get(self, uri: str) -> CacheEntry | None:
+        (entry,) = await self.get_many([uri])
+        return entry
+
+    @override
+    async def get_many(self, uris: Iterable[str]) -> list[CacheEntry | None]:
+        await self._ready()
+        uris = list(uris)
+        present = [uri for uri in uris if self.is_present(uri)]
+        found = dict(zip(present, await self._materialize(present)))
+        return [found.get(uri) for uri in uris]
+
+    @override
+    async def peek(self, uri: str) -> CacheEntry | None:
+        await self._ready()
+        if uri not in self._index:
+            return None
+        (entry,) = await self._materialize([uri])
+        return entry
+
+    @override
+    async def renew(self, uri: str, metadata: dict | None = None) -> CacheEntry | None:
+        await self._ready()
+        entry = self._index.get(uri)
+        if entry is None:
+            return None
+
+        # The local copy is renewed too, so it is not downloaded again
+        local = await self._tier.renew(uri, metadata)
+        renewed = replace(
+            entry,
+            timestamp=local.timestamp if local else timestamp(),
+            metadata=(entry.metadata or {}) | metadata if metadata else entry.metadata,
+        )
+        self._set(uri, renewed)
+        self._pending[uri] = renewed
+        return renewed
+
+    @override
+    async def get_entries(
+        self, filter: Filter | None = None
+    ) -> Iterable[tuple[str, CacheEntry]]:
+        await self._ready()
+        # Outdated entries kept to be renewed are not served
+        uris = [u for u in self._select(filter) if self.is_present(u)]
+        return list(zip(uris, await self._materialize(uris)))
+
+    @override
+    async def clean(self, filter: Filter | None = None) -> int:
+        await self._ready()
+        loop = asyncio.get_running_loop()
+        if filter is None:
+            keys = await loop.run_in_executor(None, self._list, self.prefix + "/")
+            await loop.run_in_executor(None, self._delete, list(keys))
+            return sum(keys.values()) + await self._tier.clean()
+
+        uris = self._select(filter)
+        await loop.run_in_executor(None, self._delete, [self._blob(uri) for uri in uris])
+
+        size = 0
+        for uri in uris:
+            size += self._discard(uri).size or 0
+            self._pending[uri] = None
+
+        # Local copies recorded with older metadata are left to the tier eviction
+        size += await self._tier.clean(filter)
+        await self.flush()
+        return size
+
+    @override
+    async def flush(self) -> None:
+        await self._ready()
+        async with self._flush_lock:
+            await self._tier.flush()
+            if not self._pending:
+                return
+
+            start = time.perf_counter()
+            records, self._pending = self._pending, {}
+            lines = b"".join(
+                orjson.dumps({"uri": uri, "entry": to_record(e) if e else None}) + b"\n"
+                for uri, e in records.items()
+            )
+            try:
+                await self._put(self._index_key(f"segment-{segment_id()}.jsonl"), lines)
+            except BaseException:
+                self._pending = records | self._pending
+                raise
+
+            self._segments += 1
+            if self._segments >= self.compact_every:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._compact)
+
+            cache_stats.flushed(
+                time.perf_counter() - start,
+                len(self._index),
+                sum(e.size for e in self._index.values()),
+            )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.flush()
+
+    async def autosave(self, interval: int = 5):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def _blob(self, uri: str) -> str:
+        return f"{self.prefix}/blobs/{hashlib.sha256(uri.encode()).hexdigest()}"
+
+    def _index_key(self, name: str) -> str:
+        return f"{self.prefix}/index/{name}"
+
+    def _set(self, uri: str, entry: CacheEntry) -> None:
+        previous = self._index.get(uri)
+        if previous is not None:
+            self._indexes.remove(uri, previous)
+        self._index[uri] = entry
+        self._indexes.add(uri, entry)
+
+    def _discard(self, uri: str) -> CacheEntry:
+        entry = self._index.pop(uri)
+        self._indexes.remove(uri, entry)
+        return entry
+
+    def _select(self, filter: Filter | None) -> list[str]:
+        if not filter:
+            return list(self._index)
+
+        predicate = filter.compile()
+        candidates = self._indexes.lookup(filter)
+        if candidates is None:
+            return [k for k, e in self._index.items() if predicate(e)]
+        return [k for k in candidates if predicate(self._index[k])]
+
+    def _start(self) -> None:
+        try:
+            for uri, entry in self._load().items():
+                self._set(uri, entry)
+            self._delete_invalid()
+            self._loading.set_result(None)
+        except BaseException as e:
+            self._loading.set_exception(e)
+
+    async def _ready(self) -> None:
+        if not self._loading.done():
+            await asyncio.wrap_future(self._loading)
+        self._loading.result()
+
+    def _delete_invalid(self) -> None:
+        # Expired entries are only hidden, other writers may use a longer lifespan
+        for uri, entry in list(self._index.items()):
+            if is_expired(entry, self.lifespan):
+                self._discard(uri)
+
+    def _update_experiment(
+        self, uri: str, entry: CacheEntry, metadata: dict | None
+    ) -> CacheEntry:
+        # If metadata.experiment is present, update it !
+        experiment = (metadata or {}).get("experiment", None)
+        if not experiment or experiment == (entry.metadata or {}).get("experiment"):
+            return entry
+
+        updated = replace(entry, metadata=(entry.metadata or {}) | {"experiment": experiment})
+        self._set(uri, replace(self._index[uri], metadata=updated.metadata))
+        self._pending[uri] = updated
+        return updated
+
+    async def _materialize(self, uris: list[str]) -> list[CacheEntry]:
+        """Get the local copies of the given indexed entries, downloading the blobs that
+        are missing from the local tier or older than the indexed version
+
+        Args:
+            uris (list[str]): URIs present in the index
+
+        Returns:
+            list[CacheEntry]: local entries, with the indexed timestamp and metadata
+        """
+
+        with self._tier.pinned(uris):
+            return await self._download(uris)
+
+    async def _download(self, uris: list[str]) -> list[CacheEntry]:
+        # The later batches must not evict the local copies of the earlier ones, the
+        # caller pins them
+        entries: list[CacheEntry] = []
+        # Downloads are kept in memory until stored, so they are done in bounded batches
+        for start in range(0, len(uris), self.transfers * 8):
+            batch = uris[start : start + self.transfers * 8]
+            local = await self._tier.get_many(batch)
+            stale = [
+                idx
+                for idx, (uri, entry) in enumerate(zip(batch, local))
+                if entry is None or entry.timestamp < self._index[uri].timestamp
+            ]
+
+            data = await asyncio.gather(*(self._get(self._blob(batch[idx])) for idx in stale))
+            created = await self._tier.create_many(
+                (batch[idx], contents, self._index[batch[idx]].metadata)
+                for idx, contents in zip(stale, data)
+            )
+            for idx, entry in zip(stale, created):
+                local[idx] = entry
+
+            for uri, entry in zip(batch, local):
+                indexed = self._index[uri]
+                entries.append(
+                    replace(entry, timestamp=indexed.timestamp, metadata=indexed.metadata)
+                )
+
+        return entries
+
+    async def _get(self, key: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(None, self._read, key)
+
+    async def _put(self, key: str, data: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            await loop.run_in_executor(
+                None, lambda: self._client.put_object(Bucket=self.bucket, Key=key, Body=data)
+            )
+
+    def _read(self, key: str) -> bytes:
+        return self._client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def _list(self, prefix: str) -> dict[str, int]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        return {
+            obj["Key"]: obj["Size"]
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix)
+            for obj in page.get("Contents", [])
+        }
+
+    def _delete(self, keys: list[str]) -> None:
+        for start in range(0, len(keys), 1000):
+            self._client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[start : start + 1000]]},
+            )
+
+    def _scan(self) -> tuple[list[str], list[str]]:
+        keys = sorted(self._list(self._index_key("")))
+        snapshots = [k for k in keys if k.rsplit("/", 1)[1].startswith("snapshot-")]
+        segments = [k for k in keys if k.rsplit("/", 1)[1].startswith("segment-")]
+        return snapshots, segments
+
+    def _snapshot(self, snapshots: list[str]) -> tuple[dict[str, dict], str]:
+        if not snapshots:
+            return {}, ""
+        return orjson.loads(self._read(snapshots[-1])), key_id(snapshots[-1])
+
+    def _replay(self, raw: dict[str, dict], key: str) -> None:
+        for line in self._read(key).splitlines():
+            record = orjson.loads(line)
+            if record["entry"] is None:
+                raw.pop(record["uri"], None)
+            else:
+                raw[record["uri"]] = record["entry"]
+
+    def _load(self) -> Index:
+        # A concurrent compaction may delete the listed segments, list them again
+        for attempt in range(3):
+            try:
+                snapshots, segments = self._scan()
+                raw, last = self._snapshot(snapshots)
+                newer = [k for k in segments if key_id(k) > last]
+                for key in newer:
+                    self._replay(raw, key)
+                break
+            except self._client.exceptions.NoSuchKey:
+                if attempt == 2:
+                    raise
+
+        self._segments = len(newer)
+        return {
+            uri: CacheEntry(path=Path(self._blob(uri)), **record) for uri, record in raw.items()
+        }
+
+    def _compact(self) -> None:
+        """Merge the segments older than `compact_grace` into a new snapshot. Younger ones
+        may still be uploading from other writers, with an older id than the visible ones."""
+
+        cutoff = f"{time.time_ns() - self.compact_grace * 1_000_000_000:020d}"
+        snapshots, segments = self._scan()
+        raw, last = self._snapshot(snapshots)
+
+        merged = [k for k in segments if key_id(k) > last and key_id(k)[:20] < cutoff]
+        if not merged:
+            return
+
+        for key in merged:
+            self._replay(raw, key)
+
+        last = key_id(merged[-1])
+        self._client.put_object(
+            Bucket=self.bucket,
+            Key=self._index_key(f"snapshot-{last}.json"),
+            Body=orjson.dumps(raw),
+        )
+
+        # The previous snapshot is kept for readers that listed it before this one existed
+        self._delete(snapshots[:-1] + [k for k in segments if key_id(k) <= last])
+        self._segments = len([k for k in segments if key_id(k) > last])
@@ -0,0 +1,440 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, ClassVar, Container, Iterable, override
+
+import orjson
+
+from fastrag.cache.cache import CacheEntry, ContentsCallable, CreateItem, ICache, resolve
+from fastrag.cache.eviction import LFUPolicy, LRUPolicy
+from fastrag.cache.filters import AndFilter, Filter, MetadataFilter, OrFilter
+from fastrag.cache.index import INDEXED
+from fastrag.cache.lineage import is_renewable, is_stale
+from fastrag.cache.local import is_expired
+from fastrag.cache.stats import cache_stats
+from fastrag.cache.utils import content_digest, timestamp, unlink_many, write_temp
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS entries (
+    uri TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    metadata TEXT,
+    digest TEXT,
+    size INTEGER,
+    access_time REAL,
+    hits INTEGER,
+    {", ".join(f"{c} TEXT" for c in INDEXED)}
+);
+{"".join(f"CREATE INDEX IF NOT EXISTS idx_{c} ON entries ({c});" for c in INDEXED)}
+"""
+
+COLUMNS = ("uri", "path", "timestamp", "metadata", "digest", "size", *INDEXED)
+
+# Columns added since the first version of the schema
+MIGRATIONS = {"digest": "TEXT", "size": "INTEGER", "access_time": "REAL", "hits": "INTEGER"}
+
+# Eviction policies as the order of their candidates
+EVICTION_ORDER = {
+    LRUPolicy.supported: "access_time",
+    LFUPolicy.supported: "hits, access_time",
+}
+
+type Query = tuple[str, list[Any]]
+
+
+def compile_filter(filter: Filter) -> Query | None:
+    """Compile a filter tree into a SQL `WHERE` clause with its parameters
+
+    Args:
+        filter (Filter): filter to compile
+
+    Returns:
+        Query | None: clause and parameters, None if some node can not be expressed in SQL
+    """
+
+    match filter:
+        case MetadataFilter(criteria=criteria):
+            clauses, params = ["metadata IS NOT NULL"], []
+            for key, expected in criteria.items():
+                if isinstance(expected, (dict, list)):
+                    return None
+                if key in INDEXED and isinstance(expected, str):
+                    clauses.append(f"{key} IS ?")
+                elif '"' not in key:
+                    clauses.append("json_extract(metadata, ?) IS ?")
+                    params.append(f'$."{key}"')
+                else:
+                    return None
+                params.append(expected)
+            return " AND ".join(clauses), params
+        case AndFilter(filters=filters) | OrFilter(filters=filters):
+            is_and = isinstance(filter, AndFilter)
+            if not filters:
+                return ("0" if is_and else "1"), []
+
+            clauses, params = [], []
+            for f in filters:
+                compiled = compile_filter(f)
+                if compiled is None:
+                    return None
+                clauses.append(f"({compiled[0]})")
+                params.extend(compiled[1])
+            return (" AND " if is_and else " OR ").join(clauses), params
+        case _:
+            return None
+
+
+def dump_metadata(metadata: dict | None) -> str | None:
+    # Stored as text, SQLite 3.45+ reads JSON given as a BLOB as its binary JSONB format
+    return orjson.dumps(metadata).decode() if metadata else None
+
+
+def to_row(uri: str, entry: CacheEntry) -> tuple:
+    metadata = entry.metadata or {}
+    return (
+        uri,
+        str(entry.path),
+        entry.timestamp,
+        dump_metadata(entry.metadata),
+        entry.digest,
+        entry.size,
+        # Other values are only matched through the JSON, as the column would coerce them
+        *(v if isinstance(v := metadata.get(c), str) else None for c in INDEXED),
+    )
+
+
+def from_row(
+    path: str, time: float, metadata: str | None, digest: str | None, size: int | None
+) -> CacheEntry:
+    return CacheEntry(
+        path=Path(path),
+        timestamp=time,
+        metadata=orjson.loads(metadata) if metadata else None,
+        digest=digest,
+        size=size,
+    )
+
+
+@dataclass
+class SqliteCache(ICache):
+    """Cache storing its entries in a SQLite database, with the blobs kept on disk.
+    Metadata filters are compiled to SQL and answered through indexes."""
+
+    base: ClassVar[Path] = Path(".fastrag")
+    supported: ClassVar[str] = "sqlite"
+
+    _db: sqlite3.Connection = field(init=False, repr=False)
+    _data: Path = field(init=False, repr=False)
+    _lock: asyncio.Lock = field(init=False, repr=False, default_factory=asyncio.Lock)
+    _size: int = field(init=False, repr=False, default=0)
+
+    def __post_init__(self) -> None:
+        if self.eviction not in EVICTION_ORDER:
+            raise ValueError(f"Unsupported eviction policy: {self.eviction!r}")
+
+        self._data = self.base / "cache"
+        self._connect()
+
+    def _connect(self) -> None:
+        self._data.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.base / "cache.sqlite3", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        for column, kind in MIGRATIONS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE entries ADD COLUMN {column} {kind}")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_eviction "
+            f"ON entries ({EVICTION_ORDER[self.eviction]})"
+        )
+
+        self._delete_invalid()
+        (self._size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+    @override
+    def is_present(self, uri: str) -> bool:
+        row = self._db.execute("SELECT timestamp FROM entries WHERE uri = ?", (uri,)).fetchone()
+        return row is not None and row[0] + self.lifespan >= timestamp()
+
+    @override
+    async def create(
+        self,
+        uri: str,
+        contents: bytes,
+        metadata: dict | None = None,
+    ) -> CacheEntry:
+        (entry,) = await self.create_many([(uri, contents, metadata)])
+        return entry
+
+    @override
+    async def create_many(self, items: Iterable[CreateItem]) -> list[CacheEntry]:
+        items = list(items)
+        entries = [
+            CacheEntry(
+                path=self._data / hashlib.sha256(uri.encode()).hexdigest(),
+                metadata=metadata,
+                size=len(contents),
+                digest=content_digest(contents),
+            )
+            for uri, contents, metadata in items
+        ]
+
+        # Repeated URIs in a batch keep their last contents
+        writes = {e.path: contents for e, (_, contents, _) in zip(entries, items)}
+
+        staged = await asyncio.gather(*(write_temp(p, data) for p, data in writes.items()))
+        for path, tmp in zip(writes, staged):
+            os.replace(tmp, path)
+        for entry in entries:
+            cache_stats.written(entry.metadata, entry.size)
+
+        rows = {uri: to_row(uri, entry) for (uri, _, _), entry in zip(items, entries)}
+        now = time.time()
+        async with self._lock:
+            for uri in rows:
+                replaced = self._db.execute(
+                    "SELECT size FROM entries WHERE uri = ?", (uri,)
+                ).fetchone()
+                self._size -= (replaced and replaced[0]) or 0
+            self._size += sum(row[COLUMNS.index("size")] for row in rows.values())
+
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO entries ({', '.join(COLUMNS)}, access_time, hits) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))}, ?, 1)",
+                [(*row, now) for row in rows.values()],
+            )
+            await self._evict(keep=rows.keys())
+
+        return entries
+
+    @override
+    async def get_or_create(
+        self,
+        uri: str,
+        contents: ContentsCallable,
+        metadata: dict | None = None,
+    ) -> tuple[bool, CacheEntry]:
+        entry = await self.get(uri)
+        if entry is None and (outdated := await self.peek(uri)):
+            # Derived from unchanged inputs, regenerating it would give the same
+            if is_renewable(outdated, metadata):
+                entry = await self.renew(uri)
+
+        if entry and not is_stale(entry, metadata):
+            cache_stats.hit(entry.metadata)
+
+            # If metadata.experiment is present, update it !
+            experiment = (metadata or {}).get("experiment", None)
+            if experiment and experiment != (entry.metadata or {}).get("experiment"):
+                entry = replace(
+                    entry, metadata=(entry.metadata or {}) | {"experiment": experiment}
+                )
+                async with self._lock:
+                    self._db.execute(
+                        "UPDATE entries SET metadata = ?, experiment = ? WHERE uri = ?",
+                        (dump_metadata(entry.metadata), experiment, uri),
+                    )
+
+            return True, entry
+
+        cache_stats.miss(metadata)
+        return False, await self.create(uri, await resolve(contents), metadata)
+
+    @override
+    async def get(self, uri: str) -> CacheEntry | None:
+        async with self._lock:
+            row = self._db.execute(
+                "SELECT path, timestamp, metadata, digest, size FROM entries WHERE uri = ?",
+                (uri,),
+            ).fetchone()
+            if row is None or row[1] + self.lifespan < timestamp():
+                return None
+
+            self._touch(uri)
+        return from_row(*row)
+
+    @override
+    async def peek(self, uri: str) -> CacheEntry | None:
+        async with self._lock:
+            row = self._db.execute(
+                "SELECT path, timestamp, metadata, digest, size FROM entries WHERE uri = ?",
+                (uri,),
+            ).fetchone()
+        return from_row(*row) if row else None
+
+    @override
+    async def renew(self, uri: str, metadata: dict | None = None) -> CacheEntry | None:
+        entry = await self.peek(uri)
+        if entry is None:
+            return None
+
+        renewed = replace(
+            entry,
+            timestamp=timestamp(),
+            metadata=(entry.metadata or {}) | metadata if metadata else entry.metadata,
+        )
+        async with self._lock:
+            self._db.execute(
+                f"INSERT INTO entries ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))}) ON CONFLICT (uri) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[1:]),
+                to_row(uri, renewed),
+            )
+            self._touch(uri)
+        return renewed
+
+    @override
+    async def get_entries(
+        self, filter: Filter | None = None
+    ) -> Iterable[tuple[str, CacheEntry]]:
+        # Outdated entries kept to be renewed are not served
+        query = (
+            "SELECT uri, path, timestamp, metadata, digest, size FROM entries "
+            "WHERE timestamp >= ?"
+        )
+        params: list[Any] = [timestamp() - self.lifespan]
+
+        compiled = compile_filter(filter) if filter else None
+        if compiled:
+            query += f" AND ({compiled[0]})"
+            params += compiled[1]
+
+        # The connection is shared, the query must not interleave with the writes
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            rows = await loop.run_in_executor(
+                None, lambda: self._db.execute(query, params).fetchall()
+            )
+
+        entries = [(uri, from_row(*rest)) for uri, *rest in rows]
+        if filter and not compiled:
+            # Custom filters can not be pushed down, evaluate them in Python
+            predicate = filter.compile()
+            return [(k, e) for k, e in entries if predicate(e)]
+        return entries
+
+    @override
+    async def clean(self, filter: Filter | None = None) -> int:
+        loop = asyncio.get_running_loop()
+        if filter is None:
+            async with self._lock:
+                (size,) = self._db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                self._db.close()
+                await loop.run_in_executor(None, self._wipe)
+                # Empty again, the cache stays usable
+                self._connect()
+            return size
+
+        entries = list(await self.get_entries(filter))
+        async with self._lock:
+            self._db.executemany(
+                "DELETE FROM entries WHERE uri = ?", [(uri,) for uri, _ in entries]
+            )
+            await loop.run_in_executor(None, unlink_many, [e.path for _, e in entries])
+            self._size -= sum(e.size or 0 for _, e in entries)
+
+        await self.flush()
+        return sum(e.size or 0 for _, e in entries)
+
+    @override
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._db.in_transaction:
+                return
+
+            start = time.perf_counter()
+            self._db.commit()
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            cache_stats.flushed(time.perf_counter() - start, entries, size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.flush()
+
+    async def autosave(self, interval: int = 5):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def _touch(self, uri: str) -> None:
+        self._db.execute(
+            "UPDATE entries SET access_time = ?, hits = COALESCE(hits, 0) + 1 WHERE uri = ?",
+            (time.time(), uri),
+        )
+
+    async def _evict(self, keep: Container[str]) -> None:
+        """Remove entries in the eviction policy order until the cache fits its quota. Must be
+        called with the lock held.
+
+        Args:
+            keep (Container[str]): URIs that must not be evicted (the ones just created)
+        """
+
+        if self.max_size is None or self._size <= self.max_size:
+            return
+
+        freed, victims = 0, []
+        # Entries never accessed since the columns were added are evicted first
+        candidates = self._db.execute(
+            f"SELECT uri, path, size FROM entries ORDER BY {EVICTION_ORDER[self.eviction]}"
+        )
+        for uri, path, size in candidates:
+            if uri in keep:
+                continue
+
+            victims.append((uri, Path(path)))
+            freed += size or 0
+            if self._size - freed <= self.max_size:
+                break
+        candidates.close()
+
+        if not victims:
+            return
+
+        self._db.executemany("DELETE FROM entries WHERE uri = ?", [(u,) for u, _ in victims])
+        self._size -= freed
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, unlink_many, [path for _, path in victims])
+
+    def _wipe(self) -> None:
+        # Blobs are the bulk of the files, they are deleted concurrently before the tree
+        unlink_many(Path(e.path) for e in os.scandir(self._data))
+        shutil.rmtree(self.base)
+
+    def _delete_invalid(self) -> None:
+        rows = self._db.execute(
+            "SELECT uri, path, timestamp, metadata, digest, size FROM entries "
+            "WHERE timestamp < ?",
+            (timestamp() - self.lifespan,),
+        ).fetchall()
+        expired = [
+            (uri, entry)
+            for uri, *rest in rows
+            if is_expired(entry := from_row(*rest), self.lifespan)
+        ]
+        if not expired:
+            return
+
+        unlink_many(entry.path for _, entry in expired)
+        self._db.executemany(
+            "DELETE FROM entries WHERE uri = ?", [(uri,) for uri, _ in expired]
+        )
+        self._db.commit()
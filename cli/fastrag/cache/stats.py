@@ -0,0 +1,120 @@
+import threading
+from dataclasses import asdict, dataclass, field, replace
+from typing import Callable
+
+type Key = tuple[str, str]
+
+# Called with the duration, entry count and referenced bytes of each metadata flush
+type FlushListener = Callable[[float, int, int], None]
+
+
+def key(metadata: dict | None) -> Key:
+    metadata = metadata or {}
+    return str(metadata.get("step") or ""), str(metadata.get("strategy") or "")
+
+
+@dataclass
+class Counters:
+    hits: int = 0
+    misses: int = 0
+    written_bytes: int = 0
+    read_bytes: int = 0
+
+
+@dataclass
+class CacheStats:
+    """Cache effectiveness per step and strategy, summarized at the end of a run and read
+    by the `cache_*` instruments of `fastrag.serve.telemetry.metrics`. They are process
+    local, the server only exports the activity of its own caches."""
+
+    flushes: int = 0
+    flush_seconds: float = 0.0
+    metadata_entries: int = 0
+    metadata_bytes: int = 0
+
+    _counters: dict[Key, Counters] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _flush_listeners: list[FlushListener] = field(default_factory=list, repr=False)
+
+    def hit(self, metadata: dict | None) -> None:
+        with self._lock:
+            self._get(key(metadata)).hits += 1
+
+    def miss(self, metadata: dict | None) -> None:
+        with self._lock:
+            self._get(key(metadata)).misses += 1
+
+    def written(self, metadata: dict | None, size: int) -> None:
+        with self._lock:
+            self._get(key(metadata)).written_bytes += size
+
+    def read(self, metadata: dict | None, size: int) -> None:
+        with self._lock:
+            self._get(key(metadata)).read_bytes += size
+
+    def flushed(self, seconds: float, entries: int, size: int) -> None:
+        """Record a metadata flush
+
+        Args:
+            seconds (float): flush duration
+            entries (int): entries in the metadata after the flush
+            size (int): bytes referenced by those entries
+        """
+
+        with self._lock:
+            self.flushes += 1
+            self.flush_seconds += seconds
+            self.metadata_entries = entries
+            self.metadata_bytes = size
+
+        for listener in self._flush_listeners:
+            listener(seconds, entries, size)
+
+    def on_flush(self, listener: FlushListener) -> None:
+        """Register a listener of every metadata flush, to record their distributions
+
+        Args:
+            listener (FlushListener): called with the flush duration, entry count and bytes
+        """
+
+        self._flush_listeners.append(listener)
+
+    def counters(self) -> dict[Key, Counters]:
+        """Snapshot of the per step and strategy counters
+
+        Returns:
+            dict[Key, Counters]: copied counters by (step, strategy)
+        """
+
+        with self._lock:
+            return {k: replace(c) for k, c in self._counters.items()}
+
+    def summary(self) -> dict:
+        """JSON serializable summary of the recorded activity
+
+        Returns:
+            dict: per step and strategy counters, flushes and metadata size
+        """
+
+        with self._lock:
+            steps = [
+                {"step": step, "strategy": strategy}
+                | asdict(c)
+                | {"hit_ratio": c.hits / (c.hits + c.misses) if c.hits + c.misses else None}
+                for (step, strategy), c in sorted(self._counters.items())
+            ]
+            return {
+                "steps": steps,
+                "flushes": self.flushes,
+                "flush_seconds": self.flush_seconds,
+                "metadata": {"entries": self.metadata_entries, "bytes": self.metadata_bytes},
+            }
+
+    def _get(self, k: Key) -> Counters:
+        counters = self._counters.get(k)
+        if counters is None:
+            counters = self._counters[k] = Counters()
+        return counters
+
+
+cache_stats = CacheStats()
@@ -1,8 +1,85 @@
+import asyncio
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import TypeAlias
+from pathlib import Path
+from typing import AsyncIterable, Iterable, TypeAlias
 
 PosixTimestamp: TypeAlias = float
 
 
 def timestamp() -> PosixTimestamp:
     return datetime.now().timestamp()
+
+
+def content_digest(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+async def write_temp(path: Path, content: bytes) -> Path:
+    """Write the content into a uniquely named temporary file next to `path`, to be
+    atomically renamed over it with `os.replace`.
+
+    Args:
+        path (Path): final path of the content
+        content (bytes): content to write
+
+    Returns:
+        Path: temporary file path
+    """
+
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    # Opened, written and closed in a single executor call, so large batches never hold
+    # more files open than there are executor threads
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, tmp.write_bytes, content)
+    return tmp
+
+
+async def spool_temp(directory: Path, chunks: AsyncIterable[bytes]) -> tuple[Path, str, int]:
+    """Write the chunks into a uniquely named temporary file of the directory as they
+    arrive, so the whole content is never held in memory. The file is deleted if the
+    chunks fail.
+
+    Args:
+        directory (Path): directory of the final path, for an atomic `os.replace`
+        chunks (AsyncIterable[bytes]): content chunks
+
+    Returns:
+        tuple[Path, str, int]: temporary file path, content digest and size
+    """
+
+    tmp = directory / f".{uuid.uuid4().hex}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+
+    loop = asyncio.get_running_loop()
+    file = await loop.run_in_executor(None, tmp.open, "wb")
+    try:
+        async for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            await loop.run_in_executor(None, file.write, chunk)
+    except BaseException:
+        file.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    await loop.run_in_executor(None, file.close)
+    return tmp, digest.hexdigest(), size
+
+
+def unlink_many(paths: Iterable[Path], workers: int = 32) -> None:
+    """Delete the given files concurrently, since unlinking is bound by filesystem latency
+    rather than CPU. Missing files are ignored.
+
+    Args:
+        paths (Iterable[Path]): files to delete
+        workers (int, optional): deleting threads. Defaults to 32.
+    """
+
+    with ThreadPoolExecutor(workers) as pool:
+        for _ in pool.map(lambda p: p.unlink(missing_ok=True), paths):
+            pass
@@ -1,18 +1,95 @@
+import asyncio
+from pathlib import Path
 from typing import Annotated
 
 import humanize
+import orjson
 import typer
 
-from fastrag import (
-    inject,
-)
 from fastrag.cache.cache import ICache
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.filters import AndFilter, Filter, MetadataFilter, OrFilter
+from fastrag.config.models import Config
 from fastrag.console import console
 from fastrag.context import AppContext
+from fastrag.tasks.fetchers.crawler import CHECKPOINT_DIR, CrawlerFetcher
 
 app = typer.Typer()
 
 
+def parse_value(value: str) -> object:
+    # Numbers, booleans and null are matched as such, anything else as a string
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return value
+
+
+def build_filter(
+    selectors: dict[str, list[str] | None], where: list[str] | None
+) -> Filter | None:
+    """Build the filter of the entries to delete. Values given for the same key are
+    alternatives, different keys must all match.
+
+    Args:
+        selectors (dict[str, list[str] | None]): metadata key to accepted string values
+        where (list[str] | None): `key=value` criteria, values are parsed as JSON if possible
+
+    Raises:
+        typer.BadParameter: malformed `where` criteria
+
+    Returns:
+        Filter | None: entries filter, None to delete everything
+    """
+
+    filters: list[Filter] = []
+    for key, values in selectors.items():
+        if values:
+            filters.append(OrFilter([MetadataFilter(**{key: v}) for v in values]))
+
+    for criteria in where or []:
+        key, sep, value = criteria.partition("=")
+        if not sep or not key:
+            raise typer.BadParameter(
+                f"Expected KEY=VALUE, got {criteria!r}", param_hint="--where"
+            )
+        filters.append(MetadataFilter(**{key: parse_value(value)}))
+
+    return AndFilter(filters) if filters else None
+
+
+def crawl_checkpoints(config: Config, filter: Filter | None) -> list[Path]:
+    """Checkpoints of the configured crawls, if the filter deletes their pages. They list
+    the pages already crawled, which a resumed crawl would not fetch again.
+
+    Args:
+        config (Config): app config
+        filter (Filter | None): filter of the entries to delete, None for everything
+
+    Returns:
+        list[Path]: checkpoint files
+    """
+
+    page = CacheEntry(
+        path=Path(), metadata={"step": "fetching", "strategy": CrawlerFetcher.supported}
+    )
+    if filter is not None and not filter.apply(page):
+        return []
+
+    directories = {
+        (strategy.params or {}).get("checkpoint_dir", CHECKPOINT_DIR)
+        for step in config.resources.sources.steps.values()
+        for strategy in step
+        if strategy.strategy == CrawlerFetcher.supported
+    }
+    return [
+        checkpoint
+        for directory in directories
+        if directory is not None
+        for checkpoint in Path(directory).glob("crawl-*.json")
+    ]
+
+
 @app.command()
 def clean(
     ctx: typer.Context,
@@ -25,21 +102,42 @@ def clean(
             confirmation_prompt=True,
         ),
     ] = False,
+    step: Annotated[
+        list[str] | None,
+        typer.Option("--step", help="Only delete the entries of this step"),
+    ] = None,
+    strategy: Annotated[
+        list[str] | None,
+        typer.Option("--strategy", help="Only delete the entries of this strategy"),
+    ] = None,
+    experiment: Annotated[
+        list[str] | None,
+        typer.Option("--experiment", help="Only delete the entries of this experiment hash"),
+    ] = None,
+    where: Annotated[
+        list[str] | None,
+        typer.Option("--where", help="Only delete the entries with this KEY=VALUE metadata"),
+    ] = None,
 ):
-    """Clean the cache"""
+    """Clean the cache, or only the entries matching the given selectors"""
     if not sure:
         raise typer.Abort()
 
     ctx: AppContext = ctx.obj
 
+    filter = build_filter(
+        {"step": step, "strategy": strategy, "experiment": experiment},
+        where,
+    )
+
     console.quiet = True
 
-    cache = inject(
-        ICache,
-        ctx.config.resources.cache.strategy,
-        lifespan=ctx.config.resources.cache.lifespan,
-    )
-    size = cache.clean()
+    # The cache built with the context, a second instance would load the same directory
+    # again and race with it
+    cache: ICache = ctx.resources.cache
+    size = asyncio.run(cache.clean(filter))
+    for checkpoint in crawl_checkpoints(ctx.config, filter):
+        checkpoint.unlink(missing_ok=True)
 
     console.quiet = False
 
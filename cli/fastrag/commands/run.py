@@ -1,5 +1,8 @@
 import asyncio
+from pathlib import Path
 
+import humanize
+import orjson
 import typer
 from rich.panel import Panel
 
@@ -8,6 +11,8 @@ from fastrag import (
     inject,
     version,
 )
+from fastrag.cache import LocalCache
+from fastrag.cache.stats import cache_stats
 from fastrag.console import console
 from fastrag.context import AppContext
 from fastrag.steps.logs import Loggable
@@ -24,6 +29,11 @@ def run(
         "-v",
         help="Enable verbose output",
     ),
+    stats: Path | None = typer.Option(
+        None,
+        "--cache-stats",
+        help="Write a JSON summary of the cache usage to this file, '-' prints it",
+    ),
 ):
     """
     Go through the process of generating a fastRAG.
@@ -47,7 +57,7 @@ def run(
     resources = ctx.resources
 
     async def run():
-        async with resources.cache:
+        async with resources.cache, resources.fetch:
             ran = await inject(
                 IRunner,
                 config.resources.sources.strategy,
@@ -71,4 +81,19 @@ def run(
                 f"[bold green]:heavy_check_mark: Completed {ran} experiments![/bold green]"
             )
 
+            cache = resources.cache
+            if isinstance(cache, LocalCache) and cache.deduplicate:
+                console.print(
+                    f"[bold green]Deduplication saved "
+                    f"{humanize.naturalsize(cache.deduplicated)}[/bold green]"
+                )
+
     asyncio.run(run())
+
+    if stats is not None:
+        summary = orjson.dumps(cache_stats.summary(), option=orjson.OPT_INDENT_2)
+        if str(stats) == "-":
+            console.quiet = False
+            console.print_json(summary.decode())
+        else:
+            stats.write_bytes(summary)
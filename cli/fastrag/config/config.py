@@ -8,6 +8,7 @@ from fastrag.cache.cache import ICache
 from fastrag.config.loaders.loader import IConfigLoader
 from fastrag.config.models import Config
 from fastrag.config.settings import settings
+from fastrag.helpers.http import fetch_client
 from fastrag.helpers.resources import RuntimeResources
 from fastrag.llms.llm import ILLM
 from fastrag.plugins import inject
@@ -30,6 +31,9 @@ def get_resources(config: Config) -> RuntimeResources:
             ICache,
             config.resources.cache.strategy,
             lifespan=config.resources.cache.lifespan,
+            max_size=config.resources.cache.max_size,
+            eviction=config.resources.cache.eviction,
+            **config.resources.cache.params or {},
         ),
         store=inject(
             IVectorStore,
@@ -42,4 +46,13 @@ def get_resources(config: Config) -> RuntimeResources:
             config.resources.llm.strategy,
             **config.resources.llm.params,
         ),
+        fetch=fetch_client(
+            http2=config.resources.fetch.http2,
+            max_connections=config.resources.fetch.max_connections,
+            max_keepalive_connections=config.resources.fetch.max_keepalive_connections,
+            keepalive_expiry=config.resources.fetch.keepalive_expiry,
+            timeout=config.resources.fetch.timeout,
+            dns_ttl=config.resources.fetch.dns_ttl,
+            headers=config.resources.fetch.headers,
+        ),
     )
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import InitVar, dataclass, field
 from typing import ClassVar, TypeAlias
 
-from fastrag.helpers.utils import parse_to_seconds
+from fastrag.helpers.utils import parse_to_bytes, parse_to_seconds
 
 
 @dataclass(frozen=True)
@@ -26,25 +26,50 @@ class MultiStrategy:
 @dataclass(frozen=True)
 class Cache:
     lifespan_str: InitVar[str] = "1d"
+    max_size_str: InitVar[str | None] = None
     strategy: str = field(default="local")
+    eviction: str = field(default="lru")
+    params: dict | None = field(default=None)
     _lifespan: int = field(init=False)
+    _max_size: int | None = field(init=False)
 
     @property
     def lifespan(self) -> int:
         return self._lifespan
 
-    def __post_init__(self, lifespan_str: str) -> None:
+    @property
+    def max_size(self) -> int | None:
+        return self._max_size
+
+    def __post_init__(self, lifespan_str: str, max_size_str: str | None) -> None:
         object.__setattr__(
             self,
             "_lifespan",
             parse_to_seconds(lifespan_str),
         )
+        object.__setattr__(
+            self,
+            "_max_size",
+            parse_to_bytes(max_size_str) if max_size_str else None,
+        )
+
+
+@dataclass(frozen=True)
+class Fetch:
+    http2: bool = True
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 10.0
+    dns_ttl: float = 300.0
+    headers: dict[str, str] | None = None
 
 
 @dataclass(frozen=True)
 class Resources:
     sources: MultiStrategy
     cache: Cache = field(default_factory=Cache)
+    fetch: Fetch = field(default_factory=Fetch)
     store: Strategy | None = field(default=None)
     llm: Strategy | None = field(default=None)
 
@@ -0,0 +1,212 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from typing import Any, Iterable
+from urllib.request import getproxies
+
+import httpcore
+import httpx
+
+
+class CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """Network backend resolving each host once per `ttl` seconds, so the connections
+    opened to the same hosts by concurrent fetchers do not repeat the lookups"""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, ttl: float) -> None:
+        self._backend = backend
+        self._ttl = ttl
+        self._addresses: dict[tuple[str, int], tuple[float, list[str]]] = {}
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        error: Exception = httpcore.ConnectError(f"No address found for {host}")
+        for address in await self._resolve(host, port):
+            try:
+                return await self._backend.connect_tcp(
+                    address,
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+
+        # Resolve again on the next attempt, the host may have moved
+        self._addresses.pop((host, port), None)
+        raise error
+
+    async def connect_unix_socket(self, *args, **kwargs) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(*args, **kwargs)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+    async def _resolve(self, host: str, port: int) -> list[str]:
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        cached = self._addresses.get((host, port))
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_STREAM
+            )
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+
+        # Keep the resolver order (RFC 6724), without duplicates
+        addresses = list(dict.fromkeys(str(info[4][0]) for info in infos))
+        self._addresses[(host, port)] = (time.monotonic() + self._ttl, addresses)
+        return addresses
+
+
+class FetchTransport(httpx.AsyncHTTPTransport):
+    """httpx transport over a connection pool resolving hosts with `CachedDNSBackend`.
+    httpx builds its pool without a network backend, so the pool is built again here with
+    the same settings and httpx maps the requests and responses as usual. The transports of
+    a client share their `backend`, and so the resolutions."""
+
+    def __init__(
+        self,
+        *,
+        http2: bool = False,
+        limits: httpx.Limits = httpx.Limits(),
+        dns_ttl: float = 300.0,
+        proxy: httpx.Proxy | None = None,
+        backend: httpcore.AsyncNetworkBackend | None = None,
+    ) -> None:
+        # Validates the proxy (scheme, SOCKS support) as httpx does
+        super().__init__(http2=http2, limits=limits, proxy=proxy)
+
+        options = dict(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=backend or CachedDNSBackend(httpcore.AnyIOBackend(), dns_ttl),
+        )
+        if proxy is None:
+            self._pool = httpcore.AsyncConnectionPool(**options)
+            return
+
+        url = httpcore.URL(
+            scheme=proxy.url.raw_scheme,
+            host=proxy.url.raw_host,
+            port=proxy.url.port,
+            target=proxy.url.raw_path,
+        )
+        if proxy.url.scheme in ("http", "https"):
+            self._pool = httpcore.AsyncHTTPProxy(
+                proxy_url=url,
+                proxy_auth=proxy.raw_auth,
+                proxy_headers=proxy.headers.raw,
+                proxy_ssl_context=proxy.ssl_context,
+                **options,
+            )
+        else:
+            self._pool = httpcore.AsyncSOCKSProxy(
+                proxy_url=url, proxy_auth=proxy.raw_auth, **options
+            )
+
+
+def proxy_mounts(**transport: Any) -> dict[str, FetchTransport | None]:
+    """Transports of the proxies set in the environment (`HTTP_PROXY`, `HTTPS_PROXY`,
+    `ALL_PROXY` and `NO_PROXY`), which httpx ignores when given a custom transport. The
+    hosts excluded by `NO_PROXY` are mapped to None, the client default transport.
+
+    Args:
+        **transport (Any): `FetchTransport` arguments
+
+    Returns:
+        dict[str, FetchTransport | None]: `mounts` of the client
+    """
+
+    proxies = getproxies()
+    excluded = [host.strip() for host in proxies.get("no", "").split(",") if host.strip()]
+    if "*" in excluded:
+        return {}
+
+    mounts: dict[str, FetchTransport | None] = {}
+    for scheme in ("http", "https", "all"):
+        if url := proxies.get(scheme):
+            url = url if "://" in url else f"http://{url}"
+            mounts[f"{scheme}://"] = FetchTransport(proxy=httpx.Proxy(url), **transport)
+    if not mounts:
+        return {}
+
+    # Same patterns as httpx, see https://curl.se/libcurl/c/CURLOPT_NOPROXY.html
+    for host in excluded:
+        try:
+            address = ipaddress.ip_address(host.split("/")[0])
+        except ValueError:
+            address = None
+
+        if "://" in host:
+            mounts[host] = None
+        elif address is not None and address.version == 6:
+            mounts[f"all://[{host}]"] = None
+        elif address is not None or host.lower() == "localhost":
+            mounts[f"all://{host}"] = None
+        else:
+            mounts[f"all://*{host}"] = None
+    return mounts
+
+
+def fetch_client(
+    *,
+    http2: bool = True,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 10.0,
+    dns_ttl: float = 300.0,
+    headers: dict[str, str] | None = None,
+) -> httpx.AsyncClient:
+    """Build the HTTP client shared by all the fetchers, so their requests to the same
+    hosts reuse the open connections (and TLS sessions) of a single pool. The proxies set
+    in the environment are honored.
+
+    Args:
+        http2 (bool, optional): negotiate HTTP/2 when the server supports it. Defaults to True.
+        max_connections (int, optional): open connections limit. Defaults to 100.
+        max_keepalive_connections (int, optional): idle connections kept. Defaults to 20.
+        keepalive_expiry (float, optional): seconds an idle connection is kept. Defaults to 30.
+        timeout (float, optional): default request timeout in seconds. Defaults to 10.
+        dns_ttl (float, optional): seconds a host resolution is reused. Defaults to 300.
+        headers (dict[str, str] | None, optional): headers sent with every request.
+
+    Returns:
+        httpx.AsyncClient: client, to be closed once all the fetchers are done
+    """
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    transport = dict(
+        http2=http2,
+        limits=limits,
+        backend=CachedDNSBackend(httpcore.AnyIOBackend(), dns_ttl),
+    )
+    return httpx.AsyncClient(
+        timeout=timeout,
+        headers=headers,
+        transport=FetchTransport(**transport),
+        mounts=proxy_mounts(**transport),
+    )
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+from httpx import AsyncClient
+
 from fastrag.cache.cache import ICache
 from fastrag.llms.llm import ILLM
 from fastrag.stores.store import IVectorStore
@@ -10,3 +12,4 @@ class RuntimeResources:
     cache: ICache
     store: IVectorStore
     llm: ILLM
+    fetch: AsyncClient
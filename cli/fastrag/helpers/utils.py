@@ -40,6 +40,39 @@ def parse_to_seconds(time: str) -> int:
     return total_seconds
 
 
+def parse_to_bytes(size: str) -> int:
+    """Parse size string to int bytes
+
+    Args:
+        size (str): size string to parse, such as "512MB" or "2GiB"
+
+    Returns:
+        int: bytes representation of given size
+    """
+
+    UNITS = {
+        "b": 1,
+        "kb": 1000,
+        "mb": 1000**2,
+        "gb": 1000**3,
+        "tb": 1000**4,
+        "kib": 1024,
+        "mib": 1024**2,
+        "gib": 1024**3,
+        "tib": 1024**4,
+    }
+
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*", size.lower())
+    if match is None:
+        raise ValueError(f"Invalid size: {size!r}")
+
+    value, unit = match.groups()
+    if (unit or "b") not in UNITS:
+        raise ValueError("Unsupported size unit")
+
+    return int(float(value) * UNITS[unit or "b"])
+
+
 def normalize_url(url: str) -> str:
     # Parse the URL into components
     parsed = urlparse(url)
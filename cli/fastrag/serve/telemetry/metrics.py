@@ -7,6 +7,8 @@ from opentelemetry.metrics import set_meter_provider
 from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.resources import Resource
 
+from fastrag.cache.stats import cache_stats
+
 _resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "fastrag")})
 metric_reader = PrometheusMetricReader()
 provider = MeterProvider(resource=_resource, metric_readers=[metric_reader])
@@ -52,6 +54,75 @@ llm_answer_length = meter.create_histogram(
     name="llm_answer_length_chars", description="Answer length in characters", unit="1"
 )
 
+
+def _per_step(counter: str):
+    def observe(options):
+        return [
+            metrics.Observation(getattr(c, counter), {"step": step, "strategy": strategy})
+            for (step, strategy), c in cache_stats.counters().items()
+        ]
+
+    return observe
+
+
+cache_hits_total = meter.create_observable_counter(
+    name="cache_hits_total",
+    callbacks=[_per_step("hits")],
+    description="Cache lookups served from the cache",
+    unit="1",
+)
+
+cache_misses_total = meter.create_observable_counter(
+    name="cache_misses_total",
+    callbacks=[_per_step("misses")],
+    description="Cache lookups that had to be computed",
+    unit="1",
+)
+
+cache_written_bytes_total = meter.create_observable_counter(
+    name="cache_written_bytes_total",
+    callbacks=[_per_step("written_bytes")],
+    description="Bytes written to the cache",
+    unit="By",
+)
+
+cache_read_bytes_total = meter.create_observable_counter(
+    name="cache_read_bytes_total",
+    callbacks=[_per_step("read_bytes")],
+    description="Bytes read from the cache",
+    unit="By",
+)
+
+# The default buckets stop at 10000, far below the size of a large cache
+_SIZE_BUCKETS = [4.0**i for i in range(21)]
+
+cache_flush_duration = meter.create_histogram(
+    name="cache_flush_duration_seconds", description="Cache metadata flush duration", unit="s"
+)
+
+cache_metadata_entries = meter.create_histogram(
+    name="cache_metadata_entries",
+    description="Entries in the cache metadata, at each flush",
+    unit="1",
+    explicit_bucket_boundaries_advisory=_SIZE_BUCKETS,
+)
+
+cache_metadata_bytes = meter.create_histogram(
+    name="cache_metadata_bytes",
+    description="Bytes referenced by the cache metadata, at each flush",
+    unit="By",
+    explicit_bucket_boundaries_advisory=_SIZE_BUCKETS,
+)
+
+
+def _record_flush(seconds: float, entries: int, size: int) -> None:
+    cache_flush_duration.record(seconds)
+    cache_metadata_entries.record(entries)
+    cache_metadata_bytes.record(size)
+
+
+cache_stats.on_flush(_record_flush)
+
 process_start_time_seconds = meter.create_observable_gauge(
     name="process_start_time_seconds",
     callbacks=[lambda options: [metrics.Observation(START_TIME)]],
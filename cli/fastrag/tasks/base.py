@@ -4,6 +4,8 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import AsyncGenerator, ClassVar, TypeAlias
 
+from httpx import AsyncClient
+
 from fastrag.cache.cache import ICache
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter
@@ -63,3 +65,7 @@ class Task[T](ITask, ABC):
     @property
     def llm(self) -> ILLM:
         return self.resources.llm
+
+    @property
+    def fetch(self) -> AsyncClient:
+        return self.resources.fetch
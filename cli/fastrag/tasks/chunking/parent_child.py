@@ -3,7 +3,6 @@ import uuid
 from dataclasses import InitVar, dataclass, field
 from typing import ClassVar, override
 
-import aiofiles
 import orjson
 from langchain_core.embeddings import Embeddings
 from langchain_experimental.text_splitter import SemanticChunker
@@ -11,6 +10,7 @@ from langchain_text_splitters import MarkdownHeaderTextSplitter
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.plugins import inject
 from fastrag.tasks.base import Run, Task
@@ -49,11 +49,14 @@ class ParentChildChunker(Task):
                 "step": "chunking",
                 "strategy": ParentChildChunker.supported,
                 "experiment": self.experiment.hash,
+                "lineage": await lineage(
+                    [entry], strategy=ParentChildChunker.supported, model=self.model.model
+                ),
             },
         )
 
-        entries_bytes = await entries.get_content()
-        entries_list = orjson.loads(entries_bytes) if entries_bytes else []
+        async with entries.view() as view:
+            entries_list = orjson.loads(view) if view else []
 
         if getattr(self, "results", None) is None:
             self.results = []
@@ -71,8 +74,8 @@ class ParentChildChunker(Task):
         return Event(Event.Type.COMPLETED, "Finished ParentChildChunking")
 
     async def chunker_logic(self, uri: str, entry: CacheEntry) -> bytes:
-        async with aiofiles.open(entry.path) as f:
-            raw_text = await f.read()
+        async with entry.view() as view:
+            raw_text = str(view, "utf-8")
 
         text, raw_metadata = clean_markdown(raw_text)
         metadata = normalize_metadata(raw_metadata, uri)
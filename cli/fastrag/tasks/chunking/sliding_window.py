@@ -3,12 +3,12 @@ import uuid
 from dataclasses import dataclass
 from typing import ClassVar, override
 
-import aiofiles
 import orjson
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.tasks.base import Run, Task
 from fastrag.tasks.chunking.markdown_utils import clean_markdown, normalize_metadata
@@ -33,11 +33,17 @@ class SlidingWindowChunker(Task):
                 "size": self.chunk_size,
                 "overlap": self.chunk_overlap,
                 "experiment": self.experiment.hash,
+                "lineage": await lineage(
+                    [entry],
+                    strategy=SlidingWindowChunker.supported,
+                    size=self.chunk_size,
+                    overlap=self.chunk_overlap,
+                ),
             },
         )
 
-        content = await entries.get_content()
-        data = orjson.loads(content)
+        async with entries.view() as view:
+            data = orjson.loads(view)
 
         if getattr(self, "results", None) is None:
             self.results = []
@@ -55,8 +61,8 @@ class SlidingWindowChunker(Task):
         return Event(Event.Type.COMPLETED, "Finished SlidingWindow")
 
     async def chunker_logic(self, uri: str, entry: CacheEntry) -> bytes:
-        async with aiofiles.open(entry.path, "r") as f:
-            raw_text = await f.read()
+        async with entry.view() as view:
+            raw_text = str(view, "utf-8")
 
         text, raw_metadata = clean_markdown(raw_text)
         metadata = normalize_metadata(raw_metadata, uri)
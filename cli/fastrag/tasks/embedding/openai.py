@@ -2,11 +2,13 @@ import json
 from dataclasses import InitVar, dataclass
 from typing import ClassVar, override
 
+import orjson
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.plugins import inject
 from fastrag.tasks.base import Run, Task
@@ -41,10 +43,15 @@ class OpenAISimple(Task):
         existed, cached = await self.cache.get_or_create(
             uri=f"{entry.path.resolve().as_uri()}.{self.__class__.__name__}.{self.model}.embedding.json",
             contents=lambda: self.embedding_logic(entry),
-            metadata={"step": "embedding", "experiment": self.experiment.hash},
+            metadata={
+                "step": "embedding",
+                "experiment": self.experiment.hash,
+                "lineage": await lineage([entry], model=self.model),
+            },
         )
 
-        data = json.loads(await cached.get_content())
+        async with cached.view() as view:
+            data = orjson.loads(view)
         if existed and data:
             vectors = []
             documents = []
@@ -71,8 +78,8 @@ class OpenAISimple(Task):
         return Event(Event.Type.COMPLETED, f"Completed {self.__class__.__name__}")
 
     async def embedding_logic(self, entry: CacheEntry) -> bytes:
-        raw_json = entry.path.read_text(encoding="utf-8")
-        chunks = json.loads(raw_json)
+        async with entry.view() as view:
+            chunks = orjson.loads(view)
 
         if not chunks:
             return json.dumps([]).encode("utf-8")
@@ -0,0 +1,44 @@
+from httpx import Response, codes
+
+from fastrag.cache.entry import CacheEntry
+
+
+def conditional_headers(entry: CacheEntry | None) -> dict[str, str]:
+    """Headers making the request conditional on the resource having changed since the
+    given entry was fetched
+
+    Args:
+        entry (CacheEntry | None): previously fetched entry, outdated or not
+
+    Returns:
+        dict[str, str]: `If-None-Match` and `If-Modified-Since` headers, when known
+    """
+
+    metadata = (entry.metadata if entry else None) or {}
+    headers = {}
+    if etag := metadata.get("etag"):
+        headers["If-None-Match"] = etag
+    if last_modified := metadata.get("last_modified"):
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def validators(response: Response) -> dict[str, str]:
+    """Validators of the response, to be stored in the metadata of its entry
+
+    Args:
+        response (Response): fetched response
+
+    Returns:
+        dict[str, str]: `etag` and `last_modified`, when sent by the server
+    """
+
+    return {
+        key: value
+        for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+        if (value := response.headers.get(header))
+    }
+
+
+def is_unchanged(response: Response, entry: CacheEntry | None) -> bool:
+    return entry is not None and response.status_code == codes.NOT_MODIFIED
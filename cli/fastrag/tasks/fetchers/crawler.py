@@ -1,21 +1,28 @@
 import asyncio
+import hashlib
+import math
+import os
 from dataclasses import InitVar, dataclass, field
+from pathlib import Path
 from typing import ClassVar, override
 from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
 
-from bs4 import BeautifulSoup
-from httpx import AsyncClient
+import orjson
 
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.helpers.utils import normalize_url
 from fastrag.plugins import inject
 from fastrag.tasks.base import Run, Task
+from fastrag.tasks.fetchers.conditional import conditional_headers, is_unchanged, validators
+from fastrag.tasks.fetchers.frontier import HostFrontiers
+from fastrag.tasks.fetchers.links import extract_links
 from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter
+from fastrag.tasks.fetchers.streaming import body_chunks
 
-
-def is_same_domain(url_a: str, url_b: str) -> bool:
-    return urlparse(url_a).netloc == urlparse(url_b).netloc
+CHECKPOINT_DIR = ".fastrag/crawls"
 
 
 @dataclass
@@ -26,143 +33,192 @@ class CrawlerFetcher(Task):
     delay: InitVar[float] = field(default=0.1, kw_only=True)
 
     url: str = ""
+    urls: list[str] = field(default_factory=list)  # more seeds, each host is crawled
     depth: int = 5
-    workers: int = 5
-
-    visited: set[str] = field(init=False, compare=False, default_factory=set, repr=False)
+    workers: int = 5  # shared by all the hosts
+    per_host: int | None = None  # workers on the same host, an even share if None
+    max_bytes: int | None = 10 * 1024 * 1024  # per page, larger ones are aborted
+    max_frontier: int | None = 100_000
+    bloom_capacity: int | None = None  # expected URLs, for crawls too big for a seen set
+    checkpoint_dir: str | None = CHECKPOINT_DIR  # None disables checkpoints
+    checkpoint_every: float = 60.0  # seconds
+    resume: bool = True
+    rate_limiting: str = "domain"  # IRateLimiter strategy
+    rate_limiting_params: dict = field(default_factory=dict)
+
+    crawled: int = field(default=0, init=False, compare=False, repr=False)
     cached: int = field(default=0, init=False, compare=False, repr=False)
+    revalidated: int = field(default=0, init=False, compare=False, repr=False)
+    dropped_links: int = field(default=0, init=False, compare=False, repr=False)
     rate_limiter: IRateLimiter | None = field(compare=False, default=None, repr=False)
 
     def __post_init__(self, delay: float) -> None:
-        self.rate_limiter = inject(IRateLimiter, "domain", delay=delay)
+        if not self.seeds:
+            raise ValueError("CrawlerFetcher needs a `url` or `urls` to start from")
+
+        self.rate_limiter = inject(
+            IRateLimiter, self.rate_limiting, delay=delay, **self.rate_limiting_params
+        )
+
+    @property
+    def seeds(self) -> list[str]:
+        seeds = ([self.url] if self.url else []) + self.urls
+        return list(dict.fromkeys(normalize_url(seed) for seed in seeds))
 
     @override
     async def run(self) -> Run:
-        self.visited.clear()
-
-        queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue()
+        # Restored below when resuming
+        self.crawled = self.cached = self.revalidated = self.dropped_links = 0
+
+        seeds = self.seeds
+        # A seed of each host, robots.txt only depends on the host
+        roots = {urlparse(seed).netloc: seed for seed in seeds}
+        per_host = self.per_host or math.ceil(self.workers / len(roots))
+        frontier = HostFrontiers(
+            list(roots),
+            per_host=per_host,
+            max_size=self.max_frontier,
+            bloom_capacity=self.bloom_capacity,
+        )
         event_queue: asyncio.Queue[Event] = asyncio.Queue()
-        await queue.put((normalize_url(self.url), 0))
-
-        async with AsyncClient(
-            timeout=5,
-            follow_redirects=True,
-            headers={"User-Agent": CrawlerFetcher.UserAgent},
-            cookies={},
-        ) as client:
-
-            async def get_robot_parser():
-                rp = RobotFileParser()
-                robots_url = urljoin(self.url, "/robots.txt")
-                try:
-                    res = await client.get(robots_url)
-                    if res.status_code == 200:
-                        rp.parse(res.text.splitlines())
-                    else:
-                        rp.parse([])
-                except Exception:
+        if self.resume and self.restore(frontier):
+            yield Event(
+                Event.Type.PROGRESS,
+                f"Resuming the crawl of {self.origin} with {len(frontier)} pending URLs",
+            )
+        else:
+            for seed in seeds:
+                frontier.put(seed, 0)
+
+        client = self.fetch
+        # Per request, as the client is shared with the other fetchers
+        headers = {"User-Agent": CrawlerFetcher.UserAgent}
+
+        async def get_robot_parser(seed: str):
+            rp = RobotFileParser()
+            robots_url = urljoin(seed, "/robots.txt")
+            try:
+                res = await client.get(
+                    robots_url, headers=headers, follow_redirects=True, timeout=5
+                )
+                if res.status_code == 200:
+                    rp.parse(res.text.splitlines())
+                else:
                     rp.parse([])
-                rp.user_agent = CrawlerFetcher.UserAgent
-                return rp
-
-            rp = await get_robot_parser()
-
-            async def parse_and_enqueue(
-                *,
-                html: str,
-                base_url: str,
-                depth: int,
-            ):
-                soup = BeautifulSoup(html, "html.parser")
-
-                for a in soup.find_all("a", href=True):
-                    next_url = urljoin(base_url, a["href"])
-                    parsed = urlparse(next_url)
-
-                    if parsed.scheme not in ("http", "https"):
+            except Exception:
+                rp.parse([])
+            rp.user_agent = CrawlerFetcher.UserAgent
+            return rp
+
+        # Fetched at once, a slow host does not delay the start of the others
+        parsers = await asyncio.gather(*(get_robot_parser(seed) for seed in roots.values()))
+        robots = dict(zip(roots, parsers))
+        for seed, rp in zip(roots.values(), parsers):
+            if (crawl_delay := rp.crawl_delay(CrawlerFetcher.UserAgent)) is not None:
+                self.rate_limiter.crawl_delay(seed, float(crawl_delay))
+
+        async def enqueue_links(entry: CacheEntry, url: str, depth: int):
+            # Links would be past the maximum depth
+            if depth >= self.depth:
+                return
+
+            for next_url in await self.outlinks(entry, url):
+                frontier.put(next_url, depth + 1)
+
+        async def download(url: str, depth: int, previous: CacheEntry | None):
+            # Streamed, the headers are checked before the body is read
+            request = client.build_request(
+                "GET",
+                url,
+                headers=headers | conditional_headers(previous),
+                timeout=5,
+            )
+            # The domain slot is held until the body is read
+            async with self.rate_limiter.request(
+                url,
+                lambda: client.send(request, stream=True, follow_redirects=True),
+            ) as res:
+                if is_unchanged(res, previous):
+                    # None if the entry was evicted or cleaned since it was peeked
+                    entry = await self.cache.renew(url, validators(res))
+                    if entry is not None:
+                        self.revalidated += 1
+                    return entry
+
+                res.raise_for_status()
+                return await self.cache.create_stream(
+                    url,
+                    body_chunks(res, self.max_bytes),
+                    {
+                        "step": "fetching",
+                        "format": "html",
+                        "strategy": CrawlerFetcher.supported,
+                        "depth": depth,
+                    }
+                    | validators(res),
+                )
+
+        async def worker():
+            while True:
+                try:
+                    url, depth = await frontier.get()
+                except asyncio.CancelledError:
+                    return
+
+                try:  # Safety measure
+                    self.crawled += 1
+                    rp = robots[urlparse(url).netloc]
+                    if not rp.can_fetch(CrawlerFetcher.UserAgent, url):
+                        await event_queue.put(
+                            Event(Event.Type.EXCEPTION, f"Blocked by robots.txt: {url}")
+                        )
                         continue
 
-                    next_url = normalize_url(next_url)
-                    if is_same_domain(base_url, next_url):
-                        await queue.put((next_url, depth + 1))
-
-            async def worker():
-                while True:
-                    try:
-                        url, depth = await queue.get()
-                    except asyncio.CancelledError:
-                        return
-
-                    try:  # Safety measure
-                        if depth > self.depth or url in self.visited:
-                            continue
-
-                        self.visited.add(url)
-                        if not rp.can_fetch(CrawlerFetcher.UserAgent, url):
-                            await event_queue.put(
-                                Event.Type.EXCEPTION,
-                                f"Blocked by robots.txt: {url}",
-                            )
-                            continue
-
-                        if self.cache.is_present(url):
-                            self.cached += 1
-
-                            cached = await self.cache.get(url)
-                            cached = await cached.get_content()
-                            html = cached.decode()
+                    entry = await self.cache.get(url)
+                    if entry is not None:
+                        self.cached += 1
 
-                            await event_queue.put(
-                                Event(
-                                    Event.Type.PROGRESS,
-                                    f"Parsing cached {url}",
-                                )
+                        await event_queue.put(
+                            Event(
+                                Event.Type.PROGRESS,
+                                f"Cached {url}",
                             )
-                        else:
-                            await event_queue.put(
-                                Event(
-                                    Event.Type.PROGRESS,
-                                    f"Fetching {url}",
-                                )
-                            )
-
-                            await self.rate_limiter.wait(url)
-                            res = await client.get(url)
-                            res.raise_for_status()
-
-                            content_type = res.headers.get("Content-Type", "")
-                            if "text/html" not in content_type:
-                                await event_queue.put(
-                                    Event(
-                                        Event.Type.EXCEPTION,
-                                        f"Unsupported content type: ({url}) {content_type}",
-                                    )
-                                )
-                                return
-
-                            html = res.text
-
-                            await self.cache.create(
-                                url,
-                                html.encode(),
-                                {
-                                    "step": "fetching",
-                                    "format": "html",
-                                    "strategy": CrawlerFetcher.supported,
-                                    "depth": depth,
-                                },
+                        )
+                    else:
+                        await event_queue.put(
+                            Event(
+                                Event.Type.PROGRESS,
+                                f"Fetching {url}",
                             )
-                        await parse_and_enqueue(html=html, base_url=url, depth=depth)
-                    except Exception as e:
-                        await event_queue.put(Event(Event.Type.EXCEPTION, f"{url}: {e}"))
-                    finally:
-                        queue.task_done()
-
-            workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
-
-            # Task that completes when crawling is finished
-            crawl_done = asyncio.create_task(queue.join())
-
+                        )
+
+                        # An outdated entry is only downloaded again if it changed
+                        previous = await self.cache.peek(url)
+                        entry = await download(url, depth, previous)
+                        if entry is None:
+                            # Gone since it was peeked, downloaded again in full
+                            entry = await download(url, depth, None)
+                    await enqueue_links(entry, url, depth)
+                except Exception as e:
+                    await event_queue.put(Event(Event.Type.EXCEPTION, f"{url}: {e}"))
+                finally:
+                    frontier.task_done(url)
+
+        async def checkpointer():
+            while True:
+                await asyncio.sleep(self.checkpoint_every)
+                state = self.dump(frontier)
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.save, state)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        if self.checkpoint_dir is not None:
+            workers.append(asyncio.create_task(checkpointer()))
+
+        # Task that completes when crawling is finished
+        crawl_done = asyncio.create_task(frontier.join())
+
+        try:
             # Drain events until crawl is done
             while not crawl_done.done() or not event_queue.empty():
                 try:
@@ -171,16 +227,123 @@ class CrawlerFetcher(Task):
                     event_queue.task_done()
                 except asyncio.TimeoutError:
                     continue
-
+        finally:
             for w in workers:
                 w.cancel()
 
+            self.dropped_links = frontier.dropped_links
+            if self.checkpoint_dir is not None:
+                if crawl_done.done():
+                    self.checkpoint.unlink(missing_ok=True)
+                else:
+                    # Interrupted, saved at once since the event loop may be closing
+                    self.save(self.dump(frontier))
+                    crawl_done.cancel()
+
+    async def outlinks(self, entry: CacheEntry, url: str) -> list[str]:
+        """Links of a crawled page to the other pages of its domain. They are stored as a
+        sidecar entry derived from the page, so crawling it again does not parse it again
+        unless its contents changed.
+
+        Args:
+            entry (CacheEntry): page entry
+            url (str): page URL
+
+        Returns:
+            list[str]: normalized URLs
+        """
+
+        async def extract() -> bytes:
+            html = str(await entry.get_content(), "utf-8")
+
+            # Parsing is CPU bound, the event loop keeps serving the other workers
+            loop = asyncio.get_running_loop()
+            return orjson.dumps(await loop.run_in_executor(None, extract_links, html, url))
+
+        _, sidecar = await self.cache.get_or_create(
+            f"{url}#outlinks",
+            extract,
+            {
+                "step": "outlinks",
+                "format": "json",
+                "strategy": CrawlerFetcher.supported,
+                "source": url,
+                "lineage": await lineage([entry]),
+            },
+        )
+        return orjson.loads(await sidecar.get_content())
+
+    @property
+    def checkpoint(self) -> Path:
+        seeds = "\n".join(sorted(self.seeds))
+        key = hashlib.sha256(seeds.encode()).hexdigest()[:16]
+        return Path(self.checkpoint_dir) / f"crawl-{key}.json"
+
+    @property
+    def settings(self) -> dict:
+        # Shape the frontiers, a checkpoint taken with other values is not resumed
+        return {
+            "depth": self.depth,
+            "max_frontier": self.max_frontier,
+            "bloom_capacity": self.bloom_capacity,
+        }
+
+    @property
+    def origin(self) -> str:
+        seeds = self.seeds
+        return seeds[0] if len(seeds) == 1 else f"{len(seeds)} seeds"
+
+    def dump(self, frontier: HostFrontiers) -> bytes:
+        return orjson.dumps(
+            {
+                "seeds": self.seeds,
+                "settings": self.settings,
+                "frontiers": frontier.dump(),
+                "crawled": self.crawled,
+                "cached": self.cached,
+                "revalidated": self.revalidated,
+            }
+        )
+
+    def save(self, state: bytes) -> None:
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint.with_suffix(".tmp")
+        tmp.write_bytes(state)
+        os.replace(tmp, self.checkpoint)
+
+    def restore(self, frontier: HostFrontiers) -> bool:
+        """Load the checkpoint of an interrupted crawl of the same seed URLs. Checkpoints
+        taken with other settings are deleted instead.
+
+        Args:
+            frontier (HostFrontiers): empty frontiers to restore
+
+        Returns:
+            bool: if there was a checkpoint to resume from
+        """
+
+        if self.checkpoint_dir is None or not self.checkpoint.exists():
+            return False
+
+        state = orjson.loads(self.checkpoint.read_bytes())
+        if state.get("settings") != self.settings:
+            self.checkpoint.unlink(missing_ok=True)
+            return False
+
+        frontier.load(state["frontiers"])
+        self.crawled = state["crawled"]
+        self.cached = state["cached"]
+        self.revalidated = state["revalidated"]
+        return True
+
     @override
     def completed_callback(self) -> Event:
         return Event(
             Event.Type.COMPLETED,
             (
-                f"From {self.url}, crawled {len(self.visited)} sites "
-                f"({self.cached} cached) with CrawlerFetcher"
+                f"From {self.origin}, crawled {self.crawled} sites "
+                f"({self.cached} cached, {self.revalidated} revalidated, "
+                f"{self.dropped_links} links dropped from the full frontier) "
+                "with CrawlerFetcher"
             ),
         )
@@ -0,0 +1,247 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+
+class BloomFilter:
+    """Set of strings in a fixed amount of memory. Membership tests may give false
+    positives (at most `error_rate` of them once `capacity` items are added), never false
+    negatives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def dump(self) -> dict:
+        return {
+            "size": self.size,
+            "hashes": self.hashes,
+            "bits": base64.b64encode(self.bits).decode("ascii"),
+        }
+
+    @staticmethod
+    def load(state: dict) -> "BloomFilter":
+        bloom = BloomFilter.__new__(BloomFilter)
+        bloom.size = state["size"]
+        bloom.hashes = state["hashes"]
+        bloom.bits = bytearray(base64.b64decode(state["bits"]))
+        return bloom
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing, the k positions are derived from two 64-bit hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8])
+        b = int.from_bytes(digest[8:]) | 1
+        return ((a + i * b) % self.size for i in range(self.hashes))
+
+
+@dataclass
+class Frontier:
+    """URLs left to crawl, served breadth-first (lowest depth first). URLs are deduplicated
+    when they are discovered, so each one is only queued once, and discoveries past
+    `max_size` pending URLs are dropped. `dropped_links` counts those discoveries, a URL
+    linked from several pages is counted each time.
+
+    Args:
+        max_size (int | None): pending URLs limit, unbounded if None
+        bloom_capacity (int | None): expected number of URLs, tracks the seen URLs with a
+        Bloom filter of this capacity instead of a set. Some URLs are then never crawled
+        (at most `bloom_error_rate` of them).
+        bloom_error_rate (float): false positive rate of the Bloom filter
+    """
+
+    max_size: int | None = None
+    bloom_capacity: int | None = None
+    bloom_error_rate: float = 0.001
+
+    dropped_links: int = field(default=0, init=False)
+
+    _queue: asyncio.PriorityQueue[tuple[int, int, str]] = field(
+        init=False, repr=False, default_factory=asyncio.PriorityQueue
+    )
+    _seen: set[str] | BloomFilter = field(init=False, repr=False, default_factory=set)
+    _pending: dict[str, int] = field(init=False, repr=False, default_factory=dict)
+    _in_flight: dict[str, int] = field(init=False, repr=False, default_factory=dict)
+    _order: Iterator[int] = field(init=False, repr=False, default_factory=itertools.count)
+
+    def __post_init__(self) -> None:
+        if self.bloom_capacity is not None:
+            self._seen = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+
+    def put(self, url: str, depth: int) -> bool:
+        """Queue a discovered URL, unless it was already seen or the frontier is full
+
+        Args:
+            url (str): normalized URL
+            depth (int): links followed from the seed
+
+        Returns:
+            bool: if it was queued
+        """
+
+        if url in self._seen:
+            return False
+
+        # Not marked as seen, so it is queued if found again once there is room
+        if self.max_size is not None and self._queue.qsize() >= self.max_size:
+            self.dropped_links += 1
+            return False
+
+        self._seen.add(url)
+        self._push(url, depth)
+        return True
+
+    async def get(self) -> tuple[str, int]:
+        depth, _, url = await self._queue.get()
+        del self._pending[url]
+        self._in_flight[url] = depth
+        return url, depth
+
+    def task_done(self, url: str) -> None:
+        self._in_flight.pop(url, None)
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def dump(self) -> dict:
+        """JSON serializable state, to resume the crawl. URLs being crawled are saved as
+        pending, since they may not be done when the crawl stops.
+
+        Returns:
+            dict: pending URLs with their depth, seen URLs and dropped links count
+        """
+
+        pending = [[url, depth] for url, depth in (self._in_flight | self._pending).items()]
+        seen = self._seen.dump() if isinstance(self._seen, BloomFilter) else list(self._seen)
+        return {"pending": pending, "seen": seen, "dropped_links": self.dropped_links}
+
+    def load(self, state: dict) -> None:
+        """Restore a dumped state into this empty frontier
+
+        Args:
+            state (dict): state given by `dump`
+        """
+
+        seen = state["seen"]
+        self._seen = BloomFilter.load(seen) if isinstance(seen, dict) else set(seen)
+        self.dropped_links = state["dropped_links"]
+        for url, depth in state["pending"]:
+            self._push(url, depth)
+
+    def _push(self, url: str, depth: int) -> None:
+        self._pending[url] = depth
+        # Discovery order breaks the ties, so URLs are never compared
+        self._queue.put_nowait((depth, next(self._order), url))
+
+
+@dataclass
+class HostFrontiers:
+    """One frontier per host, served round-robin to a shared pool of workers. A host is
+    skipped while `per_host` of its URLs are being crawled, so a slow host only holds its
+    share of the workers and the others keep being crawled.
+
+    Args:
+        hosts (list[str]): hosts to crawl, URLs of any other host are rejected
+        per_host (int | None): URLs of the same host crawled at once, unbounded if None
+        max_size (int | None): pending URLs limit of each host, unbounded if None
+        bloom_capacity (int | None): expected number of URLs of each host, see `Frontier`
+    """
+
+    hosts: list[str]
+    per_host: int | None = None
+    max_size: int | None = None
+    bloom_capacity: int | None = None
+
+    _frontiers: dict[str, Frontier] = field(init=False, repr=False)
+    _in_flight: dict[str, int] = field(init=False, repr=False)
+    _next: int = field(default=0, init=False, repr=False)
+    _changed: asyncio.Event = field(init=False, repr=False, default_factory=asyncio.Event)
+
+    def __post_init__(self) -> None:
+        self.hosts = list(dict.fromkeys(self.hosts))
+        self._frontiers = {
+            host: Frontier(max_size=self.max_size, bloom_capacity=self.bloom_capacity)
+            for host in self.hosts
+        }
+        self._in_flight = dict.fromkeys(self.hosts, 0)
+
+    @property
+    def dropped_links(self) -> int:
+        return sum(frontier.dropped_links for frontier in self._frontiers.values())
+
+    def put(self, url: str, depth: int) -> bool:
+        """Queue a discovered URL in the frontier of its host
+
+        Args:
+            url (str): normalized URL
+            depth (int): links followed from the seed
+
+        Returns:
+            bool: if it was queued
+        """
+
+        frontier = self._frontiers.get(urlparse(url).netloc)
+        if frontier is None or not frontier.put(url, depth):
+            return False
+
+        self._changed.set()
+        return True
+
+    async def get(self) -> tuple[str, int]:
+        while (host := self._pick()) is None:
+            self._changed.clear()
+            await self._changed.wait()
+
+        self._in_flight[host] += 1
+        return await self._frontiers[host].get()
+
+    def task_done(self, url: str) -> None:
+        host = urlparse(url).netloc
+        self._frontiers[host].task_done(url)
+        self._in_flight[host] -= 1
+        self._changed.set()
+
+    async def join(self) -> None:
+        # URLs are only discovered from pages of the same host, so a joined frontier
+        # stays empty
+        await asyncio.gather(*(frontier.join() for frontier in self._frontiers.values()))
+
+    def __len__(self) -> int:
+        return sum(len(frontier) for frontier in self._frontiers.values())
+
+    def dump(self) -> dict:
+        return {host: frontier.dump() for host, frontier in self._frontiers.items()}
+
+    def load(self, state: dict) -> None:
+        for host, frontier in state.items():
+            if host in self._frontiers:
+                self._frontiers[host].load(frontier)
+
+    def _pick(self) -> str | None:
+        # Next host, after the last one served, with pending URLs and a free slot
+        for offset in range(len(self.hosts)):
+            index = (self._next + offset) % len(self.hosts)
+            host = self.hosts[index]
+            if len(self._frontiers[host]) and (
+                self.per_host is None or self._in_flight[host] < self.per_host
+            ):
+                self._next = index + 1
+                return host
+        return None
@@ -1,10 +1,10 @@
 from dataclasses import dataclass, field
 from typing import ClassVar, override
 
-from httpx import AsyncClient
-
 from fastrag.events import Event
 from fastrag.tasks.base import Run, Task
+from fastrag.tasks.fetchers.conditional import conditional_headers, is_unchanged, validators
+from fastrag.tasks.fetchers.streaming import body_chunks
 
 
 @dataclass
@@ -12,7 +12,9 @@ class HttpFetcher(Task):
     supported: ClassVar[str] = "URL"
 
     url: str
+    max_bytes: int | None = 10 * 1024 * 1024  # larger responses are aborted
     cached: bool = field(init=False, default=False, hash=False, compare=False)
+    revalidated: bool = field(init=False, default=False, hash=False, compare=False)
 
     @override
     async def run(self) -> Run:
@@ -20,28 +22,48 @@ class HttpFetcher(Task):
             self.cached = True
             return
 
+        # An outdated entry is only downloaded again if it changed
+        previous = await self.cache.peek(self.url)
+        request = self.fetch.build_request(
+            "GET", self.url, headers=conditional_headers(previous)
+        )
         try:
-            async with AsyncClient(timeout=10) as client:
-                res = await client.get(self.url)
+            # Streamed, the headers are checked before the body is read
+            res = await self.fetch.send(request, stream=True)
         except Exception as e:
             yield Event(Event.Type.EXCEPTION, f"ERROR: {e}")
             return
 
-        entry = await self.cache.create(
-            self.url,
-            res.text.encode(),
-            {
-                "step": "fetching",
-                "format": "html",
-                "strategy": HttpFetcher.supported,
-            },
-        )
+        try:
+            if is_unchanged(res, previous):
+                self.revalidated = True
+                entry = await self.cache.renew(self.url, validators(res))
+            else:
+                res.raise_for_status()
+                entry = await self.cache.create_stream(
+                    self.url,
+                    body_chunks(res, self.max_bytes),
+                    {
+                        "step": "fetching",
+                        "format": "html",
+                        "strategy": HttpFetcher.supported,
+                    }
+                    | validators(res),
+                )
+        except Exception as e:
+            yield Event(Event.Type.EXCEPTION, f"ERROR: {e}")
+            return
+        finally:
+            await res.aclose()
 
         self.result = entry.path
 
     @override
     def completed_callback(self) -> Event:
-        return Event(
-            Event.Type.COMPLETED,
-            f"{'Cached' if self.cached else 'Fetched'} {self.url}",
-        )
+        if self.cached:
+            status = "Cached"
+        elif self.revalidated:
+            status = "Revalidated"
+        else:
+            status = "Fetched"
+        return Event(Event.Type.COMPLETED, f"{status} {self.url}")
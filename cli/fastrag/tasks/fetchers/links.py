@@ -0,0 +1,86 @@
+from functools import cache
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from fastrag.helpers.utils import normalize_url
+
+
+class HrefParser(HTMLParser):
+    """Tokenizer collecting the `<a href>` values, without building any tree"""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.hrefs: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag != "a":
+            return
+        for name, value in attrs:
+            if name == "href" and value:
+                self.hrefs.append(value)
+                return
+
+
+@cache
+def lexbor():
+    # Optional C-backed parser, the tokenizer is used when missing
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError:
+        return None
+    return LexborHTMLParser
+
+
+def fast_hrefs(html: str) -> list[str]:
+    parser = lexbor()
+    if parser is not None:
+        return [
+            href
+            for node in parser(html).css("a[href]")
+            if (href := node.attributes.get("href"))
+        ]
+
+    tokenizer = HrefParser()
+    tokenizer.feed(html)
+    tokenizer.close()
+    return tokenizer.hrefs
+
+
+def soup_hrefs(html: str) -> list[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    return [a["href"] for a in soup.find_all("a", href=True)]
+
+
+def extract_links(html: str, base_url: str) -> list[str]:
+    """Extract the links of a page to other pages of its domain. CPU bound, meant to be run
+    in an executor. Uses selectolax when installed, the standard library tokenizer otherwise
+    and BeautifulSoup if the fast path fails.
+
+    Args:
+        html (str): page contents
+        base_url (str): page URL, relative links are resolved against it
+
+    Returns:
+        list[str]: normalized http(s) URLs in the same domain, in document order
+    """
+
+    try:
+        hrefs = fast_hrefs(html)
+    except Exception:
+        hrefs = soup_hrefs(html)
+
+    domain = urlparse(base_url).netloc
+    links = []
+    for href in hrefs:
+        next_url = urljoin(base_url, href.strip())
+        parsed = urlparse(next_url)
+        if parsed.scheme not in ("http", "https"):
+            continue
+
+        next_url = normalize_url(next_url)
+        if urlparse(next_url).netloc == domain:
+            links.append(next_url)
+
+    return links
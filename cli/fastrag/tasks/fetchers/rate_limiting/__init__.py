@@ -1,4 +1,5 @@
 from fastrag.tasks.fetchers.rate_limiting.domain import DomainRateLimiter
-from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter
+from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter, parse_retry_after
+from fastrag.tasks.fetchers.rate_limiting.token_bucket import TokenBucketRateLimiter
 
-__all__ = [IRateLimiter, DomainRateLimiter]
+__all__ = [IRateLimiter, DomainRateLimiter, TokenBucketRateLimiter, parse_retry_after]
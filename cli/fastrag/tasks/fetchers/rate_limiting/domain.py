@@ -1,7 +1,7 @@
 import asyncio
 import time
 from dataclasses import dataclass, field
-from typing import ClassVar
+from typing import ClassVar, override
 from urllib.parse import urlparse
 
 from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter
@@ -13,17 +13,41 @@ class DomainRateLimiter(IRateLimiter):
 
     locks: dict[str, asyncio.Lock] = field(default_factory=dict)
     timestamps: dict[str, float] = field(default_factory=dict)
+    delays: dict[str, float] = field(default_factory=dict)  # from robots.txt
 
     async def wait(self, url: str):
         domain = urlparse(url).netloc
         if domain not in self.locks:
             self.locks[domain] = asyncio.Lock()
-            self.timestamps[domain] = 0.0
+            self.timestamps.setdefault(domain, 0.0)
 
         async with self.locks[domain]:
             now = time.monotonic()
             elapsed = now - self.timestamps[domain]
-            wait_time = self.delay - elapsed
+            wait_time = self._delay(domain) - elapsed
             if wait_time > 0:
                 await asyncio.sleep(wait_time)
             self.timestamps[domain] = time.monotonic()
+
+    @override
+    def done(
+        self,
+        uri: str,
+        status: int | None = None,
+        latency: float | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        if retry_after is None:
+            return
+
+        # Next request allowed once the server asked
+        domain = urlparse(uri).netloc
+        next_at = time.monotonic() + retry_after - self._delay(domain)
+        self.timestamps[domain] = max(self.timestamps.get(domain, 0.0), next_at)
+
+    @override
+    def crawl_delay(self, uri: str, delay: float) -> None:
+        self.delays[urlparse(uri).netloc] = delay
+
+    def _delay(self, domain: str) -> float:
+        return max(self.delay, self.delays.get(domain, 0.0))
@@ -1,12 +1,50 @@
+import time
 from abc import abstractmethod
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, ClassVar
+
+from httpx import Response, TransportError, codes
 
 from fastrag.plugins import PluginBase
 
 
+def parse_retry_after(value: str | None, maximum: float | None = None) -> float | None:
+    """Parse a `Retry-After` header, given in seconds or as an HTTP date
+
+    Args:
+        value (str | None): header value
+        maximum (float | None, optional): longest wait, unbounded if None. Defaults to None.
+
+    Returns:
+        float | None: seconds to wait, None if missing or malformed
+    """
+
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = max(retry_at.timestamp() - time.time(), 0.0)
+
+    return seconds if maximum is None else min(seconds, maximum)
+
+
 @dataclass(frozen=True)
 class IRateLimiter(PluginBase):
+    # Statuses of an overloaded server, retried once allowed again
+    THROTTLED: ClassVar[tuple[int, ...]] = (codes.TOO_MANY_REQUESTS, codes.SERVICE_UNAVAILABLE)
+
     delay: float = 1.0  # seconds between requests
+    retries: int = 2  # per throttled request
+    max_retry_after: float = 300.0  # seconds, longer waits asked by the server are cut
 
     @abstractmethod
     async def wait(self, uri: str):
@@ -16,3 +54,77 @@ class IRateLimiter(PluginBase):
             uri (str): URI to check
         """
         raise NotImplementedError
+
+    def done(
+        self,
+        uri: str,
+        status: int | None = None,
+        latency: float | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Report the outcome of a request allowed by `wait`
+
+        Args:
+            uri (str): requested URI
+            status (int | None, optional): response status, None if the request failed
+            latency (float | None, optional): seconds until the response headers
+            retry_after (float | None, optional): seconds asked by the server to wait
+        """
+
+    def crawl_delay(self, uri: str, delay: float) -> None:
+        """Set the minimum delay between requests to the domain of the URI, as asked by
+        its robots.txt
+
+        Args:
+            uri (str): URI of the domain
+            delay (float): seconds between requests
+        """
+
+    @asynccontextmanager
+    async def request(
+        self, uri: str, send: Callable[[], Awaitable[Response]]
+    ) -> AsyncIterator[Response]:
+        """Send a request once allowed, reporting its outcome once the response is closed,
+        so streamed bodies count towards the concurrency and the latency. Throttled
+        requests are sent again, up to `retries` times, after the wait asked by the server.
+
+        Args:
+            uri (str): requested URI
+            send (Callable[[], Awaitable[Response]]): sends the request, streamed or not
+
+        Yields:
+            Response: last response, closed when the context exits
+        """
+
+        for attempt in range(self.retries + 1):
+            await self.wait(uri)
+            start = time.monotonic()
+            try:
+                response = await send()
+            except BaseException:
+                self.done(uri)
+                raise
+
+            retry_after = parse_retry_after(
+                response.headers.get("Retry-After"), self.max_retry_after
+            )
+            if response.status_code in self.THROTTLED and attempt < self.retries:
+                await response.aclose()
+                self.done(uri, response.status_code, time.monotonic() - start, retry_after)
+                continue
+
+            try:
+                yield response
+            except TransportError:
+                # The body failed, the server struggles as when the request does
+                self.done(uri)
+                raise
+            except BaseException:
+                # Given up by the caller (unsupported or too large), not a server issue
+                self.done(uri, response.status_code, time.monotonic() - start, retry_after)
+                raise
+            finally:
+                await response.aclose()
+
+            self.done(uri, response.status_code, time.monotonic() - start, retry_after)
+            return
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import ClassVar, override
+from urllib.parse import urlparse
+
+from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter
+
+
+@dataclass
+class Bucket:
+    """Request tokens of a domain, refilled at `rate` tokens per second up to `capacity`"""
+
+    rate: float
+    capacity: float
+    max_rate: float
+    tokens: float
+    updated: float = field(default_factory=time.monotonic)
+    blocked_until: float = 0.0
+    decreased: float = float("-inf")  # time of the last rate decrease
+    slots: asyncio.Semaphore | None = None
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+@dataclass(frozen=True)
+class TokenBucketRateLimiter(IRateLimiter):
+    """Per-domain token buckets, allowing bursts of `burst` requests and then `1 / delay`
+    requests per second. The rate of each domain adapts to its responses (AIMD): it grows
+    while requests are fast and succeed, and is cut when the server is slow, fails or
+    throttles, at most once per request interval since the responses in flight were sent
+    at the previous rate. `Retry-After` and robots.txt `Crawl-delay` are honored.
+
+    Args:
+        burst (int): requests allowed at once after an idle period
+        concurrency (int | None): requests in flight per domain, unbounded if None
+        min_rate (float): lowest requests per second
+        max_rate (float): highest requests per second
+        increase (float): requests per second added for each second of successful requests
+        decrease (float): factor applied to the rate when the server struggles
+        target_latency (float): seconds over which a response counts as slow
+    """
+
+    supported: ClassVar[str] = "token_bucket"
+
+    burst: int = 5
+    concurrency: int | None = 4
+    min_rate: float = 0.2
+    max_rate: float = 50.0
+    increase: float = 1.0
+    decrease: float = 0.5
+    target_latency: float = 2.0
+
+    buckets: dict[str, Bucket] = field(default_factory=dict)
+
+    @override
+    async def wait(self, uri: str):
+        bucket = self._bucket(urlparse(uri).netloc)
+        if bucket.slots is not None:
+            await bucket.slots.acquire()
+
+        # Tokens are reserved at once, possibly going negative, so the waiters are served
+        # in order without holding a lock while sleeping
+        now = time.monotonic()
+        bucket.refill(now)
+        bucket.tokens -= 1
+        wait_time = max(-bucket.tokens / bucket.rate, bucket.blocked_until - now)
+        if wait_time > 0:
+            try:
+                await asyncio.sleep(wait_time)
+            except BaseException:
+                bucket.tokens += 1
+                if bucket.slots is not None:
+                    bucket.slots.release()
+                raise
+
+    @override
+    def done(
+        self,
+        uri: str,
+        status: int | None = None,
+        latency: float | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        bucket = self._bucket(urlparse(uri).netloc)
+        if bucket.slots is not None:
+            bucket.slots.release()
+
+        now = time.monotonic()
+        bucket.refill(now)
+        if retry_after is not None:
+            # No tokens are left for the pause, the burst is not sent right after it
+            bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+        struggling = (
+            status is None
+            or status in self.THROTTLED
+            or status >= 500
+            or (latency is not None and latency > self.target_latency)
+        )
+        if struggling:
+            # The requests sent before the last decrease report the same congestion
+            if now - bucket.decreased >= 1 / bucket.rate:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                bucket.decreased = now
+        else:
+            # One increase per second of requests at the current rate
+            bucket.rate = min(bucket.max_rate, bucket.rate + self.increase / bucket.rate)
+
+    @override
+    def crawl_delay(self, uri: str, delay: float) -> None:
+        if delay <= 0:
+            return
+
+        bucket = self._bucket(urlparse(uri).netloc)
+        bucket.max_rate = min(bucket.max_rate, 1 / delay)
+        bucket.rate = min(bucket.rate, bucket.max_rate)
+        bucket.capacity = 1.0
+        bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+    def _bucket(self, domain: str) -> Bucket:
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            rate = 1 / self.delay if self.delay > 0 else self.max_rate
+            rate = min(max(rate, self.min_rate), self.max_rate)
+            bucket = Bucket(
+                rate=rate,
+                capacity=float(self.burst),
+                max_rate=self.max_rate,
+                tokens=float(self.burst),
+                slots=asyncio.Semaphore(self.concurrency) if self.concurrency else None,
+            )
+            self.buckets[domain] = bucket
+        return bucket
@@ -1,78 +1,309 @@
 import asyncio
 import re
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass, field
-from typing import ClassVar, override
-
-import httpx
+import zlib
+from dataclasses import InitVar, dataclass, field
+from datetime import UTC, datetime
+from typing import ClassVar, Iterable, NamedTuple, override
 
+from fastrag.cache.cache import CreateItem
 from fastrag.events import Event
+from fastrag.plugins import inject
 from fastrag.tasks.base import Run, Task
+from fastrag.tasks.fetchers.conditional import conditional_headers, is_unchanged, validators
+from fastrag.tasks.fetchers.rate_limiting.rate_limiter import IRateLimiter
+from fastrag.tasks.fetchers.streaming import body_chunks
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SitemapEntry(NamedTuple):
+    loc: str
+    lastmod: float | None  # POSIX timestamp
+
+
+def parse_lastmod(value: str | None) -> float | None:
+    """Parse a W3C datetime `lastmod` (full datetime or date only)
+
+    Args:
+        value (str | None): `lastmod` text
+
+    Returns:
+        float | None: POSIX timestamp, None if missing or malformed
+    """
+
+    if not value:
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.timestamp()
 
 
 @dataclass
 class SitemapXMLFetcher(Task):
     supported: ClassVar[str] = "SitemapXML"
 
+    delay: InitVar[float] = field(default=0.1, kw_only=True)
+
     regex: list[str] | None = field(compare=False, hash=False)
     url: str
+    workers: int = 8
+    batch_size: int = 256  # fetched pages stored at once
+    max_bytes: int | None = 10 * 1024 * 1024  # per page, larger ones are aborted
+    rate_limiting: str = "domain"  # IRateLimiter strategy
+    rate_limiting_params: dict = field(default_factory=dict)
+
+    fetched: int = field(default=0, init=False, compare=False, repr=False)
+    cached: int = field(default=0, init=False, compare=False, repr=False)
+    revalidated: int = field(default=0, init=False, compare=False, repr=False)
+    rate_limiter: IRateLimiter | None = field(compare=False, default=None, repr=False)
+
+    _patterns: list[re.Pattern] = field(init=False, compare=False, repr=False)
+    _pending: list[CreateItem] = field(
+        init=False, compare=False, repr=False, default_factory=list
+    )
+
+    def __post_init__(self, delay: float) -> None:
+        self.rate_limiter = inject(
+            IRateLimiter, self.rate_limiting, delay=delay, **self.rate_limiting_params
+        )
+        self._patterns = [re.compile(reg) for reg in self.regex or []]
 
     @override
     async def run(self) -> Run:
-        # 1. Fetch sitemap
-        res = httpx.get(self.url)
-        res.raise_for_status()
-
-        # 2. Parse XML
-        root = ET.fromstring(res.text)
-        urls: list[str] = []
-        skipped = 0
-        for entry in root.findall("{*}url"):
-            loc = entry.find("{*}loc")
-            if loc is not None and any(re.search(reg, loc.text) for reg in self.regex):
-                urls += [loc.text]
-            else:
-                skipped += 1
-
-        yield Event(
-            type=Event.Type.PROGRESS,
-            data=(
-                f"Retrieving {len(urls)} URLs "
-                f"(filtered out {skipped} out of {len(urls) + skipped})"
-            ),
-        )
+        self.results = []
+        self.fetched = self.cached = self.revalidated = 0
 
-        # 3. Fetch filtered URLs
-        async with httpx.AsyncClient(timeout=10) as client:
-            tasks = [self.fetch_async(client, url) for url in urls]
-            results = await asyncio.gather(*tasks)
+        # Bounded, so the sitemaps are only read as fast as their pages are fetched
+        pages: asyncio.Queue[SitemapEntry] = asyncio.Queue(maxsize=self.workers * 8)
+        events: asyncio.Queue[Event] = asyncio.Queue()
 
-        self.results = []
-        for entry, event in results:
-            self.results.append(entry)
-            yield event
-
-    async def fetch_async(self, client, url: str):
-        if self.cache.is_present(url):
-            entry = await self.cache.get(url)
-            return entry, Event(Event.Type.PROGRESS, f"Cached {url}")
-
-        try:
-            res = await client.get(url)
-        except Exception as e:
-            return None, Event(Event.Type.EXCEPTION, f"ERROR: {e}")
-
-        entry = await self.cache.create(
-            url,
-            res.text.encode(),
-            {
-                "step": "fetching",
-                "format": "html",
-                "strategy": SitemapXMLFetcher.supported,
-            },
-        )
-        return entry, Event(Event.Type.PROGRESS, f"Fetching {url}")
+        async def traverse():
+            await self.traverse(pages, events)
+            await pages.join()
+
+        async def worker():
+            while True:
+                page = await pages.get()
+                try:
+                    await events.put(await self.fetch_page(page))
+                except Exception as e:
+                    await events.put(Event(Event.Type.EXCEPTION, f"{page.loc}: {e}"))
+                finally:
+                    pages.task_done()
+
+        done = asyncio.create_task(traverse())
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+
+        # Drain events until every page is done
+        while not done.done() or not events.empty():
+            try:
+                yield await asyncio.wait_for(events.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                continue
+
+        for w in workers:
+            w.cancel()
+
+        # Failing to read the root sitemap fails the task
+        done.result()
+        await self.store()
+
+    async def traverse(
+        self, pages: asyncio.Queue[SitemapEntry], events: asyncio.Queue[Event]
+    ) -> None:
+        """Enqueue the pages of the sitemap, following the nested sitemap indexes
+
+        Args:
+            pages (asyncio.Queue[SitemapEntry]): pages to fetch
+            events (asyncio.Queue[Event]): task events
+        """
+
+        sitemaps = [self.url]
+        seen = {self.url}
+        enqueued: set[str] = set()
+        while sitemaps:
+            url = sitemaps.pop()
+            try:
+                found, nested = await self.parse(url)
+            except Exception as e:
+                if url == self.url:
+                    raise
+                await events.put(Event(Event.Type.EXCEPTION, f"Sitemap {url}: {e}"))
+                continue
+
+            for sitemap in nested:
+                if sitemap.loc not in seen:
+                    seen.add(sitemap.loc)
+                    sitemaps.append(sitemap.loc)
+
+            # Deduplicated as they are listed, a page may appear several times
+            matching: list[SitemapEntry] = []
+            for page in found:
+                if page.loc not in enqueued and self.matches(page.loc):
+                    enqueued.add(page.loc)
+                    matching.append(page)
+
+            if nested and not found:
+                continue
+
+            await events.put(
+                Event(
+                    Event.Type.PROGRESS,
+                    (
+                        f"Retrieving {len(matching)} URLs from {url} "
+                        f"(filtered out {len(found) - len(matching)} out of {len(found)})"
+                    ),
+                )
+            )
+
+            for page in matching:
+                await pages.put(page)
+
+    async def parse(self, url: str) -> tuple[list[SitemapEntry], list[SitemapEntry]]:
+        """Stream a sitemap, without building its whole tree. Gzipped sitemaps are
+        decompressed on the fly.
+
+        Args:
+            url (str): sitemap URL
+
+        Returns:
+            tuple[list[SitemapEntry], list[SitemapEntry]]: listed pages and nested sitemaps
+        """
+
+        parser = ET.XMLPullParser(events=("start", "end"))
+        root: ET.Element | None = None
+        pages: list[SitemapEntry] = []
+        sitemaps: list[SitemapEntry] = []
+
+        def collect(parsed: Iterable[tuple[str, ET.Element]]) -> None:
+            nonlocal root
+            for event, elem in parsed:
+                if event == "start":
+                    root = elem if root is None else root
+                    continue
+
+                tag = elem.tag.rsplit("}", 1)[-1]
+                if tag not in ("url", "sitemap"):
+                    continue
+
+                loc = elem.findtext("{*}loc")
+                if loc and loc.strip():
+                    found = SitemapEntry(
+                        loc.strip(), parse_lastmod(elem.findtext("{*}lastmod"))
+                    )
+                    (pages if tag == "url" else sitemaps).append(found)
+
+            # Drop the processed elements, the one being parsed is kept by the parser
+            if root is not None:
+                root.clear()
+
+        # `.xml.gz` sitemaps are often served with `Content-Encoding: gzip`, already
+        # decoded by httpx, so only bodies starting with the gzip magic are decompressed
+        head: bytes | None = b""
+        decompressor = None
+        async with self.fetch.stream("GET", url) as res:
+            res.raise_for_status()
+            async for chunk in res.aiter_bytes():
+                if head is not None:
+                    head += chunk
+                    if len(head) < len(GZIP_MAGIC):
+                        continue
+                    if head.startswith(GZIP_MAGIC):
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    chunk, head = head, None
+
+                parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+                collect(parser.read_events())
+
+        if head:
+            parser.feed(head)
+
+        parser.close()
+        collect(parser.read_events())
+        return pages, sitemaps
+
+    async def fetch_page(self, page: SitemapEntry) -> Event:
+        url = page.loc
+
+        cached = await self.cache.get(url)
+        if cached is not None:
+            self.cached += 1
+            self.results.append(cached)
+            return Event(Event.Type.PROGRESS, f"Cached {url}")
+
+        # Outdated entries are only downloaded again if they changed, according to the
+        # sitemap or to the server
+        previous = await self.cache.peek(url)
+        if previous is not None and page.lastmod is not None:
+            # None if the entry was evicted or cleaned since it was peeked
+            if page.lastmod <= previous.timestamp and (renewed := await self.cache.renew(url)):
+                self.revalidated += 1
+                self.results.append(renewed)
+                return Event(Event.Type.PROGRESS, f"Unchanged {url}")
+
+        while True:
+            # Streamed, the headers are checked before the body is read
+            request = self.fetch.build_request(
+                "GET", url, headers=conditional_headers(previous)
+            )
+            async with self.rate_limiter.request(
+                url, lambda: self.fetch.send(request, stream=True)
+            ) as res:
+                if is_unchanged(res, previous):
+                    renewed = await self.cache.renew(url, validators(res))
+                    if renewed is not None:
+                        self.revalidated += 1
+                        self.results.append(renewed)
+                        return Event(Event.Type.PROGRESS, f"Revalidated {url}")
+
+                    # Gone since it was peeked, downloaded again in full
+                    previous = None
+                    continue
+
+                # Still throttled after the retries, or failed
+                res.raise_for_status()
+
+                # Kept in memory, pages are stored in batches
+                contents = b"".join([chunk async for chunk in body_chunks(res, self.max_bytes)])
+                break
+
+        metadata = {
+            "step": "fetching",
+            "format": "html",
+            "strategy": SitemapXMLFetcher.supported,
+        } | validators(res)
+        if page.lastmod is not None:
+            metadata["lastmod"] = page.lastmod
+
+        self.fetched += 1
+        self._pending.append((url, contents, metadata))
+        if len(self._pending) >= self.batch_size:
+            await self.store()
+
+        return Event(Event.Type.PROGRESS, f"Fetching {url}")
+
+    async def store(self) -> None:
+        # Swapped before awaiting, so the workers keep filling a new batch
+        batch, self._pending = self._pending, []
+        if batch:
+            self.results.extend(await self.cache.create_many(batch))
+
+    def matches(self, url: str) -> bool:
+        return not self._patterns or any(p.search(url) for p in self._patterns)
 
     @override
     def completed_callback(self) -> Event:
-        return Event(Event.Type.COMPLETED, "Completed sitemap.xml")
+        return Event(
+            Event.Type.COMPLETED,
+            (
+                f"From {self.url}, fetched {self.fetched} pages "
+                f"({self.cached} cached, {self.revalidated} revalidated) with SitemapXMLFetcher"
+            ),
+        )
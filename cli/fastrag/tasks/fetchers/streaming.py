@@ -0,0 +1,69 @@
+from typing import AsyncIterator, Iterable
+
+from httpx import Response
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+# Leading markup of an HTML document, for responses without a Content-Type
+HTML_SIGNATURES = (b"<!doctype html", b"<html", b"<head", b"<body", b"<!--", b"<?xml")
+
+
+def media_type(response: Response) -> str:
+    """Media type of the response, without its parameters
+
+    Args:
+        response (Response): fetched response
+
+    Returns:
+        str: lowercase media type, empty if not sent
+    """
+
+    return response.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+
+
+def looks_like_html(head: bytes) -> bool:
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").lower().startswith(HTML_SIGNATURES)
+
+
+async def body_chunks(
+    response: Response,
+    max_bytes: int | None = None,
+    content_types: Iterable[str] = HTML_TYPES,
+) -> AsyncIterator[bytes]:
+    """Stream the body of a response opened with `stream=True`, decoded as text and encoded
+    as UTF-8 as `response.text.encode()` would. The headers are checked before reading
+    anything, and the download is aborted as soon as it goes over the size limit.
+
+    Args:
+        response (Response): streamed response
+        max_bytes (int | None, optional): size limit, unbounded if None. Defaults to None.
+        content_types (Iterable[str], optional): accepted media types. Responses without
+        one are sniffed. Defaults to HTML_TYPES.
+
+    Raises:
+        ValueError: unsupported content type or body over the size limit
+
+    Yields:
+        bytes: body chunks
+    """
+
+    content_type = media_type(response)
+    if content_type and content_type not in content_types:
+        raise ValueError(f"Unsupported content type: {content_type}")
+
+    length = response.headers.get("Content-Length", "")
+    if max_bytes is not None and length.isdigit() and int(length) > max_bytes:
+        raise ValueError(f"Response of {length} bytes, over the {max_bytes} bytes limit")
+
+    size = 0
+    async for text in response.aiter_text():
+        chunk = text.encode()
+        if not chunk:
+            continue
+        if not size and not content_type and not looks_like_html(chunk):
+            raise ValueError("Unsupported content, no Content-Type and not HTML")
+
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise ValueError(f"Response over the {max_bytes} bytes limit")
+        yield chunk
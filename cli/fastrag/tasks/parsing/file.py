@@ -1,24 +1,29 @@
+import tempfile
 from dataclasses import dataclass, field
-from functools import partial
-from pathlib import Path
 from typing import ClassVar, override
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.tasks.base import Run, Task
 
 
-def to_markdown(fmt: str, path: Path) -> bytes:
+def to_markdown(fmt: str, data: bytes) -> bytes:
     match fmt:
         case "pdf":
+            import pymupdf
             from pymupdf4llm import to_markdown
 
-            return to_markdown(path).encode()
+            return to_markdown(pymupdf.open(stream=data, filetype="pdf")).encode()
         case "docx":
             import pypandoc
 
-            return pypandoc.convert_file(path, "md").encode()
+            # Pandoc only reads binary formats from files
+            with tempfile.NamedTemporaryFile(suffix=".docx") as f:
+                f.write(data)
+                f.flush()
+                return pypandoc.convert_file(f.name, "md").encode()
         case _:
             raise TypeError(f"Unsupported file format type: {type(fmt)}")
 
@@ -34,7 +39,10 @@ class FileParser(Task):
     @override
     async def run(self, uri: str, entry: CacheEntry) -> Run:
         fmt: str = entry.metadata["format"]
-        contents = partial(to_markdown, fmt, entry.path)
+
+        async def contents() -> bytes:
+            return to_markdown(fmt, await entry.get_content())
+
         existed, entry = await self.cache.get_or_create(
             uri=entry.path.resolve().absolute().as_uri(),
             contents=contents,
@@ -42,6 +50,7 @@ class FileParser(Task):
                 "source": uri,
                 "strategy": FileParser.supported,
                 "step": "parsing",
+                "lineage": await lineage([entry], strategy=FileParser.supported),
             },
         )
 
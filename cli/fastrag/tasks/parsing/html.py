@@ -1,22 +1,20 @@
 from dataclasses import dataclass, field
-from functools import partial
-from pathlib import Path
 from typing import ClassVar, override
 from urllib.parse import urljoin
 
-import aiofiles
 from bs4 import BeautifulSoup
 from html_to_markdown import convert_to_markdown
 
 from fastrag.cache.entry import CacheEntry
 from fastrag.cache.filters import Filter, MetadataFilter
+from fastrag.cache.lineage import lineage
 from fastrag.events import Event
 from fastrag.tasks.base import Run, Task
 
 
-async def parse_to_md(path: Path, base_url: str) -> bytes:
-    async with aiofiles.open(path, "r") as f:
-        html = await f.read()
+async def parse_to_md(entry: CacheEntry, base_url: str) -> bytes:
+    async with entry.view() as view:
+        html = str(view, "utf-8")
 
     soup = BeautifulSoup(html, "html.parser")
 
@@ -41,11 +39,12 @@ class HtmlParser(Task):
     async def run(self, uri: str, entry: CacheEntry) -> Run:
         existed, _ = await self.cache.get_or_create(
             uri=entry.path.resolve().as_uri(),
-            contents=lambda: parse_to_md(entry.path, uri),
+            contents=lambda: parse_to_md(entry, uri),
             metadata={
                 "source": uri,
                 "strategy": HtmlParser.supported,
                 "step": "parsing",
+                "lineage": await lineage([entry], strategy=HtmlParser.supported),
             },
         )
 
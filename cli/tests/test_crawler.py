@@ -0,0 +1,93 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.local import LocalCache
+from fastrag.events import Event
+from fastrag.tasks.fetchers.crawler import CrawlerFetcher
+from fastrag.tasks.fetchers.frontier import HostFrontiers
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def crawler(tmp_path: Path, **kwargs) -> CrawlerFetcher:
+    return CrawlerFetcher(
+        resources=SimpleNamespace(),
+        url="https://example.com/",
+        checkpoint_dir=str(tmp_path),
+        **kwargs,
+    )
+
+
+def frontiers() -> HostFrontiers:
+    return HostFrontiers(["example.com"], per_host=1)
+
+
+def test_checkpoint_is_resumed_with_the_same_settings(tmp_path: Path):
+    interrupted = crawler(tmp_path, depth=2)
+    frontier = frontiers()
+    frontier.put("https://example.com/a", 1)
+    interrupted.save(interrupted.dump(frontier))
+
+    restored = frontiers()
+    assert crawler(tmp_path, depth=2).restore(restored)
+    assert len(restored) == 1
+
+
+def test_checkpoint_with_other_settings_is_discarded(tmp_path: Path):
+    interrupted = crawler(tmp_path, depth=2)
+    frontier = frontiers()
+    frontier.put("https://example.com/a", 1)
+    interrupted.save(interrupted.dump(frontier))
+
+    resumed = crawler(tmp_path, depth=5)
+    restored = frontiers()
+    assert not resumed.restore(restored)
+    assert len(restored) == 0
+    assert not resumed.checkpoint.exists()
+
+
+def test_entries_gone_before_their_renewal_are_fetched_again(tmp_path: Path):
+    requests = []
+
+    def serving(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        if "If-None-Match" in request.headers:
+            return httpx.Response(304)
+        return httpx.Response(
+            200, content=b"<html></html>", headers={"ETag": '"v2"', "Content-Type": "text/html"}
+        )
+
+    async def main():
+        cache = LocalCache(lifespan=3600, base=tmp_path)
+
+        # Outdated when peeked, then cleaned before being renewed
+        async def peek(uri: str) -> CacheEntry:
+            return CacheEntry(path=tmp_path / "gone", timestamp=0, metadata={"etag": '"v1"'})
+
+        cache.peek = peek
+        async with httpx.AsyncClient(transport=httpx.MockTransport(serving)) as client:
+            fetcher = CrawlerFetcher(
+                resources=SimpleNamespace(fetch=client, cache=cache),
+                url="https://example.com/",
+                checkpoint_dir=None,
+                delay=0,
+            )
+            counters = []
+            for _ in range(2):
+                events = [e async for e in fetcher.run()]
+                assert not [e for e in events if e.type == Event.Type.EXCEPTION]
+                counters.append((fetcher.crawled, fetcher.cached, fetcher.revalidated))
+            return counters
+
+    # Counted again from zero by the second run, which finds the page cached
+    assert run(main()) == [(1, 0, 0), (1, 1, 0)]
+    pages = [r for r in requests if r.url.path == "/"]
+    assert [r.headers.get("If-None-Match") for r in pages] == ['"v1"', None]
@@ -0,0 +1,123 @@
+import asyncio
+
+import orjson
+
+from fastrag.tasks.fetchers.frontier import Frontier, HostFrontiers
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_urls_are_served_breadth_first_and_once():
+    async def main():
+        frontier = Frontier()
+        assert frontier.put("https://a/deep", 2)
+        assert frontier.put("https://a/", 0)
+        assert not frontier.put("https://a/deep", 1)
+        return [await frontier.get() for _ in range(len(frontier))]
+
+    assert run(main()) == [("https://a/", 0), ("https://a/deep", 2)]
+
+
+def test_full_frontier_drops_links_until_there_is_room():
+    async def main():
+        frontier = Frontier(max_size=1)
+        frontier.put("https://a/1", 0)
+        assert not frontier.put("https://a/2", 0)
+        assert not frontier.put("https://a/2", 0)
+        assert frontier.dropped_links == 2
+
+        # Not marked as seen, so it is queued once found again with room
+        await frontier.get()
+        assert frontier.put("https://a/2", 1)
+
+    run(main())
+
+
+def test_host_frontiers_join_once_discoveries_are_crawled():
+    async def main():
+        frontier = HostFrontiers(["a", "b"], per_host=1)
+        frontier.put("https://a/", 0)
+        frontier.put("https://b/", 0)
+        assert not frontier.put("https://c/", 0)
+
+        crawled = []
+
+        async def worker():
+            while True:
+                url, depth = await frontier.get()
+                crawled.append(url)
+                if depth < 2:
+                    frontier.put(f"{url}{depth}/", depth + 1)
+                # The other workers take URLs meanwhile, of the other host only
+                await asyncio.sleep(0)
+                frontier.task_done(url)
+
+        workers = [asyncio.create_task(worker()) for _ in range(3)]
+        await asyncio.wait_for(frontier.join(), timeout=5)
+        for w in workers:
+            w.cancel()
+        return crawled
+
+    crawled = run(main())
+    assert sorted(crawled) == [
+        "https://a/",
+        "https://a/0/",
+        "https://a/0/1/",
+        "https://b/",
+        "https://b/0/",
+        "https://b/0/1/",
+    ]
+    # Hosts are served in turn
+    assert [url.split("/")[2] for url in crawled[:2]] == ["a", "b"]
+
+
+def test_per_host_limit_leaves_the_slot_to_other_hosts():
+    async def main():
+        frontier = HostFrontiers(["a", "b"], per_host=1)
+        frontier.put("https://a/1", 0)
+        frontier.put("https://a/2", 0)
+        frontier.put("https://b/1", 0)
+
+        assert await frontier.get() == ("https://a/1", 0)
+        assert await frontier.get() == ("https://b/1", 0)
+
+        # Both hosts are busy, "a" is served again once its slot is free
+        waiting = asyncio.create_task(frontier.get())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        frontier.task_done("https://a/1")
+        assert await asyncio.wait_for(waiting, timeout=1) == ("https://a/2", 0)
+
+    run(main())
+
+
+def test_interrupted_host_frontiers_resume():
+    async def interrupted() -> bytes:
+        frontier = HostFrontiers(["a", "b"], bloom_capacity=100)
+        for url in ("https://a/1", "https://a/2", "https://b/1"):
+            frontier.put(url, 1)
+
+        # Taken but not done when the crawl stops, so crawled again
+        await frontier.get()
+        return orjson.dumps(frontier.dump())
+
+    async def resumed(state: bytes) -> list[tuple[str, int]]:
+        frontier = HostFrontiers(["a", "b"], bloom_capacity=100)
+        frontier.load(orjson.loads(state))
+        assert not frontier.put("https://a/2", 1)
+        assert frontier.put("https://a/3", 2)
+
+        pending = []
+        while len(frontier):
+            pending.append(await frontier.get())
+        return pending
+
+    pending = run(resumed(run(interrupted())))
+    assert sorted(pending) == [
+        ("https://a/1", 1),
+        ("https://a/2", 1),
+        ("https://a/3", 2),
+        ("https://b/1", 1),
+    ]
@@ -0,0 +1,42 @@
+import httpcore
+import httpx
+import pytest
+
+from fastrag.helpers.http import CachedDNSBackend, fetch_client
+
+
+def pool(client: httpx.AsyncClient, url: str) -> httpcore.AsyncConnectionPool:
+    return client._transport_for_url(httpx.URL(url))._pool
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch: pytest.MonkeyPatch):
+    for name in ("http_proxy", "https_proxy", "all_proxy", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+
+def test_environment_proxies_use_the_cached_resolutions(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("HTTPS_PROXY", "proxy.internal:3128")
+    monkeypatch.setenv("NO_PROXY", "intranet.example.com,127.0.0.1")
+    client = fetch_client()
+
+    proxied = pool(client, "https://example.com/")
+    assert isinstance(proxied, httpcore.AsyncHTTPProxy)
+    assert proxied._proxy_url.host == b"proxy.internal"
+
+    direct = [pool(client, url) for url in ("http://example.com/", "https://127.0.0.1/")]
+    direct.append(pool(client, "https://docs.intranet.example.com/"))
+    for p in direct:
+        assert not isinstance(p, httpcore.AsyncHTTPProxy)
+
+    # A single backend, hosts are resolved once for every transport
+    assert isinstance(proxied._network_backend, CachedDNSBackend)
+    assert all(p._network_backend is proxied._network_backend for p in direct)
+
+
+def test_no_proxy_wildcard_disables_the_proxies(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy.internal:3128")
+    monkeypatch.setenv("NO_PROXY", "*")
+    client = fetch_client()
+    assert not isinstance(pool(client, "https://example.com/"), httpcore.AsyncHTTPProxy)
@@ -0,0 +1,40 @@
+import asyncio
+from pathlib import Path
+
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.journal import MetadataJournal
+
+
+def entry(tmp_path: Path, name: str) -> CacheEntry:
+    return CacheEntry(path=tmp_path / name)
+
+
+def test_truncated_trailing_record_is_discarded(tmp_path: Path):
+    journal = MetadataJournal(tmp_path / "metadata")
+    records = [("a", entry(tmp_path, "a")), ("b", entry(tmp_path, "b")), ("a", None)]
+    asyncio.run(journal.append(records))
+
+    # Crash in the middle of appending a record
+    path = tmp_path / "metadata" / "journal.jsonl"
+    valid = path.read_bytes()
+    path.write_bytes(valid + b'{"uri": "c", "entry": {"pa')
+
+    replayed = MetadataJournal(tmp_path / "metadata")
+    assert list(replayed.load()) == ["b"]
+    assert path.read_bytes() == valid
+
+    # Records appended after the replay are not glued to the discarded one
+    asyncio.run(replayed.append([("c", entry(tmp_path, "c"))]))
+    assert sorted(MetadataJournal(tmp_path / "metadata").load()) == ["b", "c"]
+
+
+def test_compacted_shards_and_journal_are_merged(tmp_path: Path):
+    journal = MetadataJournal(tmp_path / "metadata", shards=4)
+    metadata = {uri: entry(tmp_path, uri) for uri in ("a", "b", "c")}
+    asyncio.run(journal.append(list(metadata.items())))
+    asyncio.run(journal.compact(metadata))
+    asyncio.run(journal.append([("b", None), ("d", entry(tmp_path, "d"))]))
+
+    loaded = MetadataJournal(tmp_path / "metadata", shards=4).load()
+    assert sorted(loaded) == ["a", "c", "d"]
+    assert loaded["d"].path == (tmp_path / "d").resolve()
@@ -0,0 +1,161 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from fastrag.cache.local import LocalCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(autouse=True)
+def base(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / ".fastrag"
+
+
+def test_dedup_refcounts_through_symlinked_base(tmp_path: Path, base: Path):
+    real = tmp_path / "real"
+    real.mkdir()
+    base.symlink_to(real, target_is_directory=True)
+
+    async def first():
+        async with LocalCache(lifespan=3600, deduplicate=True) as cache:
+            await cache.create("a", b"shared")
+
+    async def second():
+        async with LocalCache(lifespan=3600, deduplicate=True) as cache:
+            await cache.create("b", b"shared")
+            await cache.create("b", b"other")
+
+            entry = await cache.get("a")
+            assert entry.path.exists()
+            assert await entry.get_content() == b"shared"
+            assert set(cache._refs.values()) == {1}
+
+    run(first())
+    run(second())
+
+
+def test_concurrent_legacy_migration(base: Path):
+    import orjson
+
+    from fastrag.cache.entry import CacheEntry
+
+    blob = base / "cache" / "blob"
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(b"legacy")
+    legacy = {"a": CacheEntry(path=blob, size=6).to_dict()}
+    (base / "metadata.json").write_bytes(orjson.dumps(legacy))
+
+    async def main():
+        caches = [LocalCache(lifespan=3600) for _ in range(2)]
+        for cache in caches:
+            entry = await cache.get("a")
+            assert await entry.get_content() == b"legacy"
+
+    run(main())
+    assert not (base / "metadata.json").exists()
+
+
+def test_invalid_compression_fails_at_creation():
+    with pytest.raises(ValueError, match="Unsupported compression codec"):
+        LocalCache(lifespan=3600, compression="brotli")
+    with pytest.raises(ValueError, match="Invalid zlib compression level"):
+        LocalCache(lifespan=3600, compression="zlib", compression_level=42)
+
+
+def test_shared_blob_outlives_overwrites():
+    async def main():
+        async with LocalCache(lifespan=3600, deduplicate=True) as cache:
+            shared = await cache.create("a", b"shared")
+            await cache.create("b", b"shared")
+            assert cache._refs[shared.path] == 2
+
+            other = await cache.create("a", b"other")
+            assert cache._refs[shared.path] == 1
+            assert shared.path.exists()
+
+            # Overwritten with the same contents, the blob is kept
+            await cache.create("b", b"shared")
+            assert cache._refs[shared.path] == 1
+            assert shared.path.exists()
+
+            await cache.create("b", b"other")
+            assert shared.path not in cache._refs
+            assert not shared.path.exists()
+            assert cache._refs[other.path] == 2
+            assert cache._size == len(b"other")
+
+    run(main())
+
+
+def test_shared_blob_outlives_evictions():
+    async def main():
+        async with LocalCache(lifespan=3600, deduplicate=True, max_size=10) as cache:
+            shared = await cache.create("a", b"12345")
+            await cache.create("b", b"12345")
+            assert cache._size == 5
+
+            # Over the quota, "a" and "b" are evicted, the last one deletes the blob
+            await cache.create("c", b"abcdefgh")
+            assert await cache.get("a") is None
+            assert await cache.get("b") is None
+            assert not shared.path.exists()
+            assert shared.path not in cache._refs
+            assert cache._size == 8
+
+        # The refcounts are rebuilt from the flushed metadata
+        async with LocalCache(lifespan=3600, deduplicate=True, max_size=10) as cache:
+            assert await cache.get("c") is not None
+            assert list(cache._refs.values()) == [1]
+            assert cache._size == 8
+
+    run(main())
+
+
+def test_shared_blobs_are_read_with_their_own_codec():
+    contents = b"compressible " * 1000
+
+    async def plain():
+        async with LocalCache(lifespan=3600, deduplicate=True) as cache:
+            await cache.create("a", contents)
+
+    async def compressed():
+        async with LocalCache(lifespan=3600, deduplicate=True, compression="zlib") as cache:
+            entry = await cache.create("b", contents)
+            assert entry.codec == "zlib"
+            assert await entry.get_content() == contents
+
+            # Streamed in chunks smaller than the blob
+            chunks = [chunk async for chunk in entry.iter_content(chunk_size=16)]
+            assert len(chunks) > 1
+            assert b"".join(chunks) == contents
+
+            plain = await cache.get("a")
+            assert plain.path != entry.path
+            assert await plain.get_content() == contents
+
+    run(plain())
+    run(compressed())
+
+
+def test_views_of_plain_and_compressed_blobs():
+    import orjson
+
+    data = orjson.dumps([{"text": "chunk"}] * 100)
+
+    async def main():
+        for compression in (None, "zlib"):
+            async with LocalCache(lifespan=3600, compression=compression) as cache:
+                entry = await cache.create(f"a.{compression}", data)
+                async with entry.view() as view:
+                    assert orjson.loads(view) == [{"text": "chunk"}] * 100
+
+                empty = await cache.create(f"b.{compression}", b"")
+                async with empty.view() as view:
+                    assert not view
+
+    run(main())
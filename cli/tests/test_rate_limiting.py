@@ -0,0 +1,46 @@
+import asyncio
+
+import httpx
+
+from fastrag.tasks.fetchers.rate_limiting import TokenBucketRateLimiter, parse_retry_after
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_retry_after_is_clamped():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("86400", maximum=300.0) == 300.0
+    assert parse_retry_after("Wed, 21 Oct 2099 07:28:00 GMT", maximum=300.0) == 300.0
+    assert parse_retry_after("soon", maximum=300.0) is None
+
+
+def test_failures_in_flight_decrease_the_rate_once():
+    async def main():
+        limiter = TokenBucketRateLimiter(delay=0.1, burst=10, concurrency=None)
+        for _ in range(10):
+            await limiter.wait("http://a/x")
+        for _ in range(10):
+            limiter.done("http://a/x", 503, 0.01)
+        return limiter.buckets["a"].rate
+
+    assert run(main()) == 5.0
+
+
+def test_slot_is_held_until_the_response_is_closed():
+    async def main():
+        limiter = TokenBucketRateLimiter(delay=0, concurrency=1)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="page"))
+        async with httpx.AsyncClient(transport=transport) as client:
+            request = client.build_request("GET", "http://a/x")
+            async with limiter.request(
+                "http://a/x", lambda: client.send(request, stream=True)
+            ) as res:
+                assert limiter.buckets["a"].slots.locked()
+                assert await res.aread() == b"page"
+
+            assert res.is_closed
+            assert not limiter.buckets["a"].slots.locked()
+
+    run(main())
@@ -0,0 +1,60 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from fastrag.cache.s3 import S3Cache  # noqa: E402
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="fastrag")
+        yield "fastrag"
+
+
+def cache(bucket: str, base: Path, **kwargs) -> S3Cache:
+    return S3Cache(lifespan=3600, bucket=bucket, local_base=str(base), **kwargs)
+
+
+def test_materialized_entries_outlive_the_tier_quota(bucket: str, tmp_path: Path):
+    async def write():
+        async with cache(bucket, tmp_path / "writer") as writer:
+            await writer.create_many(
+                (f"u{i}", bytes(1000), {"step": "fetching"}) for i in range(600)
+            )
+
+    async def read():
+        # Smaller than the entries read at once, which take several download batches
+        async with cache(bucket, tmp_path / "reader", local_max_size="100KB") as reader:
+            entries = await reader.get_entries()
+            assert len(entries) == 600
+            assert all(entry.path.exists() for _, entry in entries)
+
+            # Past the call, the tier goes back under its quota on the next write
+            await reader.create("extra", bytes(1000))
+            assert reader._tier._size <= 100_000
+
+    asyncio.run(write())
+    asyncio.run(read())
+
+
+def test_index_is_loaded_in_the_background(bucket: str, tmp_path: Path):
+    async def write():
+        async with cache(bucket, tmp_path / "writer") as writer:
+            await writer.create("a", b"contents")
+
+    async def read():
+        reader = cache(bucket, tmp_path / "reader")
+        entry = await reader.get("a")
+        assert await entry.get_content() == b"contents"
+        assert reader.is_present("a")
+
+    asyncio.run(write())
+    asyncio.run(read())
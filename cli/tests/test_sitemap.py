@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+from fastrag.cache.entry import CacheEntry
+from fastrag.cache.local import LocalCache
+from fastrag.tasks.fetchers.sitemap import SitemapEntry, SitemapXMLFetcher
+
+SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.com/a</loc></url>
+  <url><loc>https://example.com/b</loc></url>
+  <url><loc>https://example.com/a</loc></url>
+</urlset>"""
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    match request.url.path:
+        case "/sitemap.xml":
+            return httpx.Response(200, content=SITEMAP)
+        case "/raw.xml.gz":
+            return httpx.Response(200, content=gzip.compress(SITEMAP))
+        case "/encoded.xml.gz":
+            # Decoded by httpx, the body is plain XML despite the extension
+            return httpx.Response(
+                200, content=gzip.compress(SITEMAP), headers={"Content-Encoding": "gzip"}
+            )
+    return httpx.Response(404)
+
+
+async def traverse(url: str) -> list[str]:
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        fetcher = SitemapXMLFetcher(
+            resources=SimpleNamespace(fetch=client), regex=None, url=url
+        )
+        pages: asyncio.Queue = asyncio.Queue()
+        await fetcher.traverse(pages, asyncio.Queue())
+        return [pages.get_nowait().loc for _ in range(pages.qsize())]
+
+
+def test_pages_listed_twice_are_enqueued_once():
+    urls = asyncio.run(traverse("https://example.com/sitemap.xml"))
+    assert urls == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_gzipped_sitemaps_are_decoded_once():
+    for path in ("/raw.xml.gz", "/encoded.xml.gz"):
+        urls = asyncio.run(traverse(f"https://example.com{path}"))
+        assert urls == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_entries_gone_before_their_renewal_are_fetched_again(tmp_path: Path):
+    requests = []
+
+    def revalidating(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if "If-None-Match" in request.headers:
+            return httpx.Response(304)
+        return httpx.Response(
+            200, content=b"page", headers={"ETag": '"v2"', "Content-Type": "text/html"}
+        )
+
+    async def main():
+        cache = LocalCache(lifespan=3600, base=tmp_path)
+
+        # Outdated when peeked, then cleaned before being renewed
+        async def peek(uri: str) -> CacheEntry:
+            return CacheEntry(path=tmp_path / "gone", timestamp=0, metadata={"etag": '"v1"'})
+
+        cache.peek = peek
+        transport = httpx.MockTransport(revalidating)
+        async with httpx.AsyncClient(transport=transport) as client:
+            fetcher = SitemapXMLFetcher(
+                resources=SimpleNamespace(fetch=client, cache=cache), regex=None, url=""
+            )
+            fetcher.results = []
+            await fetcher.fetch_page(SitemapEntry("https://example.com/a", None))
+            await fetcher.store()
+        return fetcher
+
+    fetcher = asyncio.run(main())
+    assert (fetcher.fetched, fetcher.revalidated) == (1, 0)
+    assert [r.headers.get("If-None-Match") for r in requests] == ['"v1"', None]
+    assert [e.metadata["etag"] for e in fetcher.results] == ['"v2"']
+
+
+def test_counters_are_reset_between_runs(tmp_path: Path):
+    def serving(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/sitemap.xml":
+            return handler(request)
+        return httpx.Response(200, content=b"page", headers={"Content-Type": "text/html"})
+
+    async def main():
+        cache = LocalCache(lifespan=3600, base=tmp_path)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(serving)) as client:
+            fetcher = SitemapXMLFetcher(
+                resources=SimpleNamespace(fetch=client, cache=cache),
+                regex=None,
+                url="https://example.com/sitemap.xml",
+            )
+            counters = []
+            for _ in range(2):
+                async for _ in fetcher.run():
+                    pass
+                counters.append((fetcher.fetched, fetcher.cached))
+            return counters
+
+    assert asyncio.run(main()) == [(2, 0), (0, 2)]
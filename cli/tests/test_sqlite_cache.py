@@ -0,0 +1,118 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from fastrag.cache.filters import AndFilter, MetadataFilter, OrFilter
+from fastrag.cache.sqlite import SqliteCache, compile_filter
+
+ENTRIES = {
+    "a": {"step": "fetching", "format": "html", "lang": "en", "pages": 3},
+    "b": {"step": "fetching", "format": "pdf", "lang": "fr", "pages": 1},
+    "c": {"step": "chunking", "strategy": "parent_child", "lang": "en"},
+    "d": {"step": 1, "lang": None},
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> SqliteCache:
+    monkeypatch.chdir(tmp_path)
+    cache = SqliteCache(lifespan=3600)
+    run(cache.create_many((uri, uri.encode(), m) for uri, m in ENTRIES.items()))
+    return cache
+
+
+def select(cache: SqliteCache, filter) -> list[str]:
+    return sorted(uri for uri, _ in run(cache.get_entries(filter)))
+
+
+@pytest.mark.parametrize(
+    "filter, expected",
+    [
+        # Indexed columns
+        (MetadataFilter(step="fetching"), ["a", "b"]),
+        (MetadataFilter(step="fetching", format="pdf"), ["b"]),
+        # Keys only found in the JSON
+        (MetadataFilter(lang="en"), ["a", "c"]),
+        (MetadataFilter(pages=3), ["a"]),
+        # Non string values of indexed keys are matched through the JSON
+        (MetadataFilter(step=1), ["d"]),
+        # Alternative values
+        (OrFilter([MetadataFilter(lang="en"), MetadataFilter(lang="fr")]), ["a", "b", "c"]),
+        (OrFilter([MetadataFilter(format="html"), MetadataFilter(pages=1)]), ["a", "b"]),
+        # Missing keys and null values both match None
+        (MetadataFilter(strategy=None), ["a", "b", "d"]),
+        (MetadataFilter(lang=None), ["d"]),
+        (AndFilter([MetadataFilter(step="fetching"), MetadataFilter(lang="fr")]), ["b"]),
+        (AndFilter([]), []),
+        (OrFilter([]), ["a", "b", "c", "d"]),
+    ],
+)
+def test_compiled_filters_match_the_python_ones(cache: SqliteCache, filter, expected):
+    assert compile_filter(filter) is not None
+    assert select(cache, filter) == expected
+
+    predicate = filter.compile()
+    assert sorted(uri for uri, e in run(cache.get_entries()) if predicate(e)) == expected
+
+
+def test_filters_on_nested_values_are_evaluated_in_python(cache: SqliteCache):
+    run(cache.create("e", b"e", {"tags": ["x"]}))
+
+    filter = MetadataFilter(tags=["x"])
+    assert compile_filter(filter) is None
+    assert select(cache, filter) == ["e"]
+
+
+def test_entries_persist_across_reopen(cache: SqliteCache):
+    run(cache.flush())
+
+    reopened = SqliteCache(lifespan=3600)
+    assert select(reopened, MetadataFilter(lang="en")) == ["a", "c"]
+    assert run(run(reopened.get("b")).get_content()) == b"b"
+
+
+def test_cache_is_usable_after_being_wiped(cache: SqliteCache):
+    async def main():
+        assert await cache.clean() == 4
+        assert await cache.get("a") is None
+
+        await cache.create("a", b"again", {"lang": "en"})
+        assert await (await cache.get("a")).get_content() == b"again"
+
+    run(main())
+    assert select(cache, MetadataFilter(lang="en")) == ["a"]
+
+
+@pytest.mark.parametrize("eviction, evicted", [("lru", "c"), ("lfu", "b")])
+def test_entries_are_evicted_past_the_quota(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, eviction: str, evicted: str
+):
+    monkeypatch.chdir(tmp_path)
+
+    async def main():
+        cache = SqliteCache(lifespan=3600, max_size=12, eviction=eviction)
+        for uri in ("a", "b", "c"):
+            await cache.create(uri, b"1234")
+        for uri in ("c", "c", "b", "a"):
+            await cache.get(uri)
+
+        # Just created, "d" is never its own victim
+        await cache.create("d", b"1234")
+        present = {uri for uri in "abcd" if await cache.peek(uri)}
+        assert present == set("abcd") - {evicted}
+        assert len(list((tmp_path / ".fastrag" / "cache").iterdir())) == 3
+        await cache.flush()
+
+    run(main())
+    assert SqliteCache(lifespan=3600, max_size=12)._size == 12
+
+
+def test_unknown_eviction_policy_is_rejected(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match="Unsupported eviction policy"):
+        SqliteCache(lifespan=3600, eviction="fifo")